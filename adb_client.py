@@ -0,0 +1,565 @@
+# adb_client.py (adb host protocol client)
+#
+# Talks to the local adb server (port 5037) directly instead of spawning an `adb` process
+# per command. Every service (shell:, exec:, host:...) consumes one TCP connection, sync
+# sessions are kept open and reused per device.
+
+import os
+import re
+import socket
+import stat
+import struct
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+from decouple import config
+
+ADB_PATH = "adb"
+ADB_HOST = os.getenv("ADB_SERVER_HOST", "127.0.0.1")
+ADB_PORT = int(os.getenv("ADB_SERVER_PORT", "5037"))
+USE_NATIVE_ADB = config("ADB_NATIVE", default=True, cast=bool)
+
+SYNC_DATA_MAX = 64 * 1024
+SYNC_POOL_SIZE = 2  # idle sync sessions kept per device
+
+# shell v2 packet ids
+SHELL_STDIN, SHELL_STDOUT, SHELL_STDERR, SHELL_EXIT, SHELL_CLOSE_STDIN = 0, 1, 2, 3, 4
+
+
+class AdbError(Exception):
+    """The adb server or device answered FAIL"""
+
+
+class AdbUnavailable(Exception):
+    """The adb server can't be reached or the command isn't implemented natively,
+     callers should fall back to the adb executable"""
+
+
+class AdbConnection:
+    def __init__(self, host=ADB_HOST, port=ADB_PORT, timeout=None):
+        try:
+            self.sock = socket.create_connection((host, port), timeout=timeout)
+        except OSError as e:
+            raise AdbUnavailable(f"adb server not reachable on {host}:{port}: {e}")
+        self.sock.settimeout(timeout)
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def send_request(self, request: str):
+        payload = request.encode("utf-8")
+        self.sock.sendall(b"%04x" % len(payload) + payload)
+        self.read_status()
+
+    def read_status(self):
+        status = self.read_exact(4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise AdbError(self.read_length_prefixed().decode("utf-8", "replace"))
+        raise AdbError(f"Unexpected adb response {status!r}")
+
+    def read_length_prefixed(self) -> bytes:
+        length = int(self.read_exact(4), 16)
+        return self.read_exact(length)
+
+    def read_exact(self, size: int) -> bytes:
+        chunks = []
+        while size:
+            chunk = self.sock.recv(size)
+            if not chunk:
+                raise AdbError("Connection closed by adb server")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def read_all(self) -> bytes:
+        chunks = []
+        while True:
+            chunk = self.sock.recv(SYNC_DATA_MAX)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+    def iter_chunks(self, size=SYNC_DATA_MAX):
+        while True:
+            chunk = self.sock.recv(size)
+            if not chunk:
+                return
+            yield chunk
+
+
+class SyncSession:
+    """One open sync: service, files are transferred one after another over the same socket"""
+
+    def __init__(self, conn: AdbConnection, serial: Optional[str]):
+        self.conn = conn
+        self.serial = serial
+
+    def _send(self, command: bytes, data: bytes = b""):
+        self.conn.sock.sendall(command + struct.pack("<I", len(data)) + data)
+
+    def _read_header(self):
+        command = self.conn.read_exact(4)
+        (length,) = struct.unpack("<I", self.conn.read_exact(4))
+        return command, length
+
+    def stat(self, remote_path: str):
+        """Returns (mode, size, mtime); mode is 0 when the path does not exist"""
+        self._send(b"STAT", remote_path.encode("utf-8"))
+        command = self.conn.read_exact(4)
+        if command != b"STAT":
+            raise AdbError(f"Unexpected sync response {command!r}")
+        return struct.unpack("<III", self.conn.read_exact(12))
+
+    def iter_pull(self, remote_path: str):
+        """Yield the content of remote_path chunk by chunk"""
+        self._send(b"RECV", remote_path.encode("utf-8"))
+        while True:
+            command, length = self._read_header()
+            if command == b"DATA":
+                yield self.conn.read_exact(length)
+            elif command == b"DONE":
+                return
+            elif command == b"FAIL":
+                raise AdbError(self.conn.read_exact(length).decode("utf-8", "replace"))
+            else:
+                raise AdbError(f"Unexpected sync response {command!r}")
+
+    def pull(self, remote_path: str, local_path: str) -> int:
+        """Write remote_path to local_path, returns the number of bytes written"""
+        written = 0
+        tmp_path = local_path + ".part"
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in self.iter_pull(remote_path):
+                    f.write(chunk)
+                    written += len(chunk)
+            os.replace(tmp_path, local_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return written
+
+    def quit(self):
+        try:
+            self._send(b"QUIT")
+        finally:
+            self.conn.close()
+
+
+class AdbClient:
+    def __init__(self, host=ADB_HOST, port=ADB_PORT):
+        self.host = host
+        self.port = port
+        self._sync_pool = {}
+        self._pool_lock = threading.Lock()
+
+    def connect(self, timeout=None) -> AdbConnection:
+        return AdbConnection(self.host, self.port, timeout)
+
+    # === host services ===
+    def host_command(self, request: str, timeout=None) -> str:
+        with self.connect(timeout) as conn:
+            conn.send_request(request)
+            return conn.read_length_prefixed().decode("utf-8", "replace")
+
+    def devices(self, long: bool = False) -> str:
+        return self.host_command("host:devices-l" if long else "host:devices")
+
+    # === device services ===
+    def transport(self, serial: Optional[str], timeout=None) -> AdbConnection:
+        """New connection switched to the device, ready for one service request"""
+        conn = self.connect(timeout)
+        try:
+            conn.send_request(f"host:transport:{serial}" if serial else "host:transport-any")
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def open_service(self, serial: Optional[str], service: str, timeout=None) -> AdbConnection:
+        """Switch a new connection to the device and start service on it.
+         The caller owns the returned connection and must close it"""
+        conn = self.transport(serial, timeout)
+        try:
+            conn.send_request(service)
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def shell(self, serial: Optional[str], command: str, timeout=None):
+        """Run command with the shell v2 protocol. Returns (exit code, stdout bytes, stderr bytes).
+         Devices without shell v2 fall back to the plain shell service (exit code 0)"""
+        conn = self.transport(serial, timeout)
+        try:
+            conn.send_request(f"shell,v2,raw:{command}")
+        except AdbError:
+            conn.close()
+            with self.open_service(serial, f"shell:{command}", timeout) as conn:
+                return 0, conn.read_all(), b""
+
+        stdout, stderr, exit_code = [], [], 0
+        with conn:
+            while True:
+                try:
+                    header = conn.read_exact(5)
+                except AdbError:
+                    break
+                packet_id, length = struct.unpack("<BI", header)
+                data = conn.read_exact(length)
+                if packet_id == SHELL_STDOUT:
+                    stdout.append(data)
+                elif packet_id == SHELL_STDERR:
+                    stderr.append(data)
+                elif packet_id == SHELL_EXIT:
+                    exit_code = data[0] if data else 0
+                    break
+        return exit_code, b"".join(stdout), b"".join(stderr)
+
+    def exec_out(self, serial: Optional[str], command: str, timeout=None) -> bytes:
+        with self.open_service(serial, f"exec:{command}", timeout) as conn:
+            return conn.read_all()
+
+    # === sync service ===
+    @contextmanager
+    def sync(self, serial: Optional[str], timeout=None):
+        """Borrow an open sync session for serial from the pool (or open a new one)"""
+        session = None
+        with self._pool_lock:
+            idle = self._sync_pool.get(serial)
+            if idle:
+                session = idle.pop()
+        if session is None:
+            session = SyncSession(self.open_service(serial, "sync:", timeout), serial)
+        session.conn.sock.settimeout(timeout)
+
+        try:
+            yield session
+        except BaseException:
+            # The stream may be out of step after a failure, don't reuse it
+            session.conn.close()
+            raise
+        else:
+            with self._pool_lock:
+                idle = self._sync_pool.setdefault(serial, [])
+                if len(idle) < SYNC_POOL_SIZE:
+                    idle.append(session)
+                    session = None
+            if session is not None:
+                session.quit()
+
+
+_client = AdbClient()
+
+
+def get_client() -> AdbClient:
+    return _client
+
+
+def _decode(data: bytes) -> str:
+    return data.decode("utf-8", "replace")
+
+
+def execute_native(args: List[str], device_id: Optional[str] = None, timeout=None,
+                   text: bool = True) -> subprocess.CompletedProcess:
+    """Run an adb command line through the adb server socket.
+     Raises AdbUnavailable for commands without a native implementation"""
+    client = get_client()
+    cmd = [ADB_PATH] + (["-s", device_id] if device_id else []) + list(args)
+    command, rest = (args[0], list(args[1:])) if args else ("", [])
+
+    def completed(returncode, stdout=b"", stderr=b""):
+        if text:
+            stdout, stderr = _decode(stdout), _decode(stderr)
+        return subprocess.CompletedProcess(cmd, returncode, stdout, stderr)
+
+    try:
+        if command == "devices" and rest in ([], ["-l"]):
+            listing = client.devices(long=rest == ["-l"])
+            return completed(0, f"List of devices attached\n{listing}\n".encode("utf-8"))
+        if command == "shell" and rest:
+            return completed(*client.shell(device_id, " ".join(rest), timeout))
+        if command == "exec-out" and rest:
+            return completed(0, client.exec_out(device_id, " ".join(rest), timeout))
+        if command == "uninstall" and len(rest) == 1:
+            code, out, err = client.shell(device_id, f"pm uninstall {rest[0]}", timeout)
+            return completed(0 if b"Success" in out else 1, out, err)
+        if command == "pull" and len(rest) == 2:
+            remote_path, local_path = rest
+            if os.path.isdir(local_path):
+                local_path = os.path.join(local_path, os.path.basename(remote_path))
+            with client.sync(device_id, timeout) as session:
+                mode = session.stat(remote_path)[0]
+                is_file = mode and not stat.S_ISDIR(mode)
+                size = session.pull(remote_path, local_path) if is_file else 0
+            if not mode:
+                raise AdbError(f"remote object '{remote_path}' does not exist")
+            if not is_file:
+                raise AdbUnavailable("directory pulls go through the adb executable")
+            return completed(0, f"{remote_path}: 1 file pulled, {size} bytes\n".encode("utf-8"))
+    except AdbError as e:
+        return completed(1, b"", f"adb: error: {e}\n".encode("utf-8"))
+    except socket.timeout:
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    raise AdbUnavailable(f"adb {command} is not implemented natively")
+
+
+def iter_output_lines(device_id: Optional[str], command: str, timeout=None):
+    """Run command on the device (exec-out) and yield output lines as they arrive instead of
+     buffering the whole output. Through the adb server the command's stderr arrives mixed into
+     stdout (redirect it on the device when that matters), the adb executable fallback drops it"""
+    if USE_NATIVE_ADB:
+        try:
+            conn = get_client().open_service(device_id, f"exec:{command}", timeout)
+        except AdbUnavailable:
+            conn = None
+        if conn is not None:
+            with conn:
+                yield from _split_lines(conn.iter_chunks())
+            return
+
+    cmd = [ADB_PATH] + (["-s", device_id] if device_id else []) + ["exec-out", command]
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as process:
+        yield from _split_lines(iter(lambda: process.stdout.read1(SYNC_DATA_MAX), b""))
+
+
+class ExecStream:
+    """Binary stdout of a device command (exec-out). Through the adb server stderr is part of
+     the same stream, redirect it on the device (2>/dev/null) for binary output; the adb
+     executable fallback drops it.
+     close() may be called from another thread to end a read that is blocked waiting for data"""
+
+    def __init__(self, device_id: Optional[str], command: str, timeout=None):
+        self._conn = None
+        self._process = None
+        if USE_NATIVE_ADB:
+            try:
+                self._conn = get_client().open_service(device_id, f"exec:{command}", timeout)
+            except AdbUnavailable:
+                pass
+        if self._conn is not None:
+            self._file = self._conn.sock.makefile("rb")
+        else:
+            cmd = [ADB_PATH] + (["-s", device_id] if device_id else []) + ["exec-out", command]
+            self._process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            self._file = self._process.stdout
+
+    def read(self, size=-1) -> bytes:
+        return self._file.read(size)
+
+    def readinto(self, buffer) -> int:
+        return self._file.readinto(buffer)
+
+    def read1(self, size=-1) -> bytes:
+        """Whatever is available (at most size bytes), b"" once the command has ended"""
+        return self._file.read1(size)
+
+    def close(self):
+        # Wake up a blocked reader first, closing the buffered file would wait for its lock
+        if self._conn is not None:
+            try:
+                self._conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        elif self._process.poll() is None:
+            self._process.kill()
+        self._file.close()
+        if self._conn is not None:
+            self._conn.close()
+        else:
+            self._process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@contextmanager
+def open_output_stream(device_id: Optional[str], command: str, timeout=None):
+    """Run command on the device (exec-out) and yield a binary file object reading its stdout"""
+    with ExecStream(device_id, command, timeout) as stream:
+        yield stream
+
+
+def _split_lines(chunks):
+    pending = b""
+    for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield _decode(line).rstrip("\r")
+    if pending:
+        yield _decode(pending)
+
+
+def pull_files(device_id: Optional[str], files, timeout=None):
+    """Pull many (remote_path, local_path) pairs through one sync session, each file is
+     streamed to disk in chunks. Yields (remote_path, local_path, bytes, error) per file,
+     error is None on success. Falls back to one `adb pull` per file without the server"""
+    files = list(files)
+    index = 0
+    if USE_NATIVE_ADB:
+        client = get_client()
+        try:
+            while index < len(files):
+                failed = None
+                try:
+                    with client.sync(device_id, timeout) as session:
+                        while index < len(files):
+                            remote_path, local_path = files[index]
+                            try:
+                                result = _pull_one(session, remote_path, local_path)
+                            except (AdbError, OSError) as e:
+                                failed = (remote_path, local_path, 0, str(e))
+                                raise
+                            index += 1
+                            yield result
+                except (AdbError, OSError):
+                    if failed is None:
+                        raise  # no session could be opened
+                    # adbd ends the sync service after a FAIL: sync() dropped the session,
+                    # the remaining files go through a new one
+                    index += 1
+                    yield failed
+            return
+        except AdbUnavailable:
+            pass
+
+    for remote_path, local_path in files[index:]:
+        result = run(["pull", remote_path, local_path], device_id, timeout)
+        if result.returncode == 0:
+            size = os.path.getsize(local_path) if os.path.exists(local_path) else 0
+            yield remote_path, local_path, size, None
+        else:
+            yield remote_path, local_path, 0, result.stderr.strip()
+
+
+def _pull_one(session: SyncSession, remote_path: str, local_path: str):
+    """STAT before RECV like `adb pull`: missing and non-regular files are reported
+     without touching the session"""
+    mode = session.stat(remote_path)[0]
+    if not mode:
+        return remote_path, local_path, 0, f"remote object '{remote_path}' does not exist"
+    if not stat.S_ISREG(mode):
+        return remote_path, local_path, 0, f"'{remote_path}' is not a regular file"
+    return remote_path, local_path, session.pull(remote_path, local_path), None
+
+
+def collect_apks(apk_paths) -> List[str]:
+    """Expand a path (or list of paths) into APK files: a directory contributes every *.apk
+     in it (split APKs). App bundles (.aab) must be turned into APKs with bundletool first"""
+    if isinstance(apk_paths, str):
+        apk_paths = [apk_paths]
+    apks = []
+    for path in apk_paths:
+        if os.path.isdir(path):
+            apks.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                               if name.lower().endswith(".apk")))
+        elif path.lower().endswith(".aab"):
+            raise ValueError(f"{path}: build split APKs with bundletool and install that folder")
+        else:
+            apks.append(path)
+    if not apks:
+        raise ValueError("No APK files to install")
+    return apks
+
+
+def install_streamed(device_id: Optional[str], apk_paths, install_args: str = "-r", timeout=None):
+    """Install one or more (split) APKs through a package manager session, streaming each file
+     from disk into `pm install-write` without copying it to /data/local/tmp first.
+     Returns (success, message, timings) where timings holds seconds per phase.
+     Without the adb server this is `adb install-multiple`, timed as a single phase"""
+    apks = collect_apks(apk_paths)
+    timings = {}
+    if USE_NATIVE_ADB:
+        try:
+            return _install_session(device_id, apks, install_args, timeout, timings)
+        except AdbUnavailable:
+            timings.clear()
+
+    cmd = [ADB_PATH] + (["-s", device_id] if device_id else []) + ["install-multiple"]
+    started = time.monotonic()
+    result = subprocess.run(cmd + install_args.split() + apks, capture_output=True, text=True,
+                            timeout=timeout, check=False)
+    timings["install"] = time.monotonic() - started
+    message = (result.stdout + result.stderr).strip()
+    return result.returncode == 0 and "Success" in result.stdout, message, timings
+
+
+def _install_session(device_id, apks, install_args, timeout, timings):
+    client = get_client()
+    cmd = [ADB_PATH] + (["-s", device_id] if device_id else []) + ["install-multiple"] + apks
+    session_id = None
+
+    def shell(command):
+        code, out, err = client.shell(device_id, command, timeout)
+        return _decode(out + err).strip()
+
+    try:
+        started = time.monotonic()
+        total_size = sum(os.path.getsize(apk) for apk in apks)
+        output = shell(f"cmd package install-create {install_args} -S {total_size}")
+        match = re.search(r"\[(\d+)\]", output)
+        if not match:
+            return False, output, timings
+        session_id = match.group(1)
+        timings["create"] = time.monotonic() - started
+
+        started = time.monotonic()
+        for index, apk in enumerate(apks):
+            size = os.path.getsize(apk)
+            name = f"{index}_" + re.sub(r"[^\w.-]", "_", os.path.basename(apk))
+            service = f"exec:cmd package install-write -S {size} {session_id} {name} -"
+            with client.open_service(device_id, service, timeout) as conn, open(apk, "rb") as f:
+                for chunk in iter(lambda: f.read(SYNC_DATA_MAX), b""):
+                    conn.sock.sendall(chunk)
+                output = _decode(conn.read_all()).strip()
+            if "Success" not in output:
+                return False, output, timings
+        timings["write"] = time.monotonic() - started
+
+        started = time.monotonic()
+        output = shell(f"cmd package install-commit {session_id}")
+        timings["commit"] = time.monotonic() - started
+        if "Success" not in output:
+            return False, output, timings
+        session_id = None
+        return True, output, timings
+    except AdbError as e:
+        return False, str(e), timings
+    except socket.timeout:
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    finally:
+        if session_id is not None:
+            # leave no half-written session behind on the device
+            try:
+                shell(f"cmd package install-abandon {session_id}")
+            except (AdbError, AdbUnavailable, OSError):
+                pass
+
+
+def run(args: List[str], device_id: Optional[str] = None, timeout=None,
+        text: bool = True) -> subprocess.CompletedProcess:
+    """Same contract as subprocess.run([adb, -s, device_id, *args], capture_output=True).
+     Uses the adb server socket when possible and the adb executable otherwise"""
+    if USE_NATIVE_ADB:
+        try:
+            return execute_native(args, device_id, timeout, text)
+        except AdbUnavailable:
+            pass
+
+    cmd = [ADB_PATH] + (["-s", device_id] if device_id else []) + list(args)
+    return subprocess.run(cmd, capture_output=True, text=text, timeout=timeout, check=False)
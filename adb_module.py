@@ -1,33 +1,89 @@
+import re
 import subprocess
+import time
+import adb_client
+import device_registry
 
 ADB_PATH = "adb"
+SIGNATURE_MISMATCH = "INSTALL_FAILED_UPDATE_INCOMPATIBLE"
 
 
 def get_connected_adb_devices():
-    devices = subprocess.check_output(
-        [ADB_PATH, "devices"]).decode().split("\n")[1:-1]
-    connected_devices = [device.split("\t")[0].strip()
-                         for device in devices if device.strip()]
-    return connected_devices
-
-
-def uninstall_app(bundle_identifier, device_id):
-    adb_path = "adb"
-    try:
-        result = subprocess.run(
-            [adb_path, "-s", device_id, "uninstall", bundle_identifier],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        if "Success" in result.stdout:
-            print(f"Successfully uninstalled on {device_id}")
-        else:
-            print(f"Package {bundle_identifier} not found on {device_id}")
-    except subprocess.CalledProcessError as e:
-        print(f"An error occurred while uninstalling the app: {e}\n")
+    return device_registry.get_registry().device_ids()
+
+
+def time_left(deadline, step):
+    """Seconds until deadline (a time.monotonic() value, None for no limit) for the next step.
+     Raises subprocess.TimeoutExpired once the deadline has passed"""
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise subprocess.TimeoutExpired(step, 0)
+    return left
+
+
+def uninstall_app(bundle_identifier, device_id, timeout=None):
+    """Returns True when the package was removed, False otherwise.
+     note: on timeout (seconds) subprocess.TimeoutExpired is left to the caller"""
+    result = adb_client.run(["uninstall", bundle_identifier], device_id, timeout=timeout)
+    if "Success" in result.stdout:
+        print(f"Successfully uninstalled on {device_id}")
+        return True
+    elif result.returncode != 0:
+        print(f"An error occurred while uninstalling the app: {(result.stderr or result.stdout).strip()}\n")
+        return False
+    else:
+        print(f"Package {bundle_identifier} not found on {device_id}")
+        return False
+
+
+def get_installed_version_code(package_name, device_id, timeout=None):
+    """versionCode of the installed package read from `dumpsys package`, None when not installed"""
+    result = adb_client.run(["shell", f"dumpsys package {package_name}"], device_id, timeout=timeout)
+    match = re.search(r"versionCode=(\d+)", result.stdout)
+    return int(match.group(1)) if match else None
 
 
-def install_app(apk_path, device_id):
-    adb_path = "adb"
-    subprocess.run([adb_path, "-s", device_id, "install", apk_path])
+def install_app(apk_path, device_id, timeout=None, streamed=False, replace=False):
+    """Returns True when adb reports a successful install.
+     streamed: write the APK (or a folder/list of split APKs) straight into a package manager
+     session instead of pushing it to the device first; phase timings are printed.
+     replace: keep the installed app and its data (install -r)"""
+    return _install(apk_path, device_id, timeout, streamed, replace)[0]
+
+
+def upgrade_app(apk_path, package_name, device_id, timeout=None, streamed=False):
+    """Install over the existing app (install -r). Only when the signatures differ
+     the old app is uninstalled first. timeout covers all steps together. Returns True on success"""
+    deadline = time.monotonic() + timeout if timeout else None
+    success, message = _install(apk_path, device_id, timeout, streamed, replace=True)
+    if success or SIGNATURE_MISMATCH not in message:
+        return success
+    print(f"Signature mismatch on {device_id}, reinstalling")
+    uninstall_app(package_name, device_id, timeout=time_left(deadline, "uninstall"))
+    return install_app(apk_path, device_id, timeout=time_left(deadline, "install"), streamed=streamed)
+
+
+def _install(apk_path, device_id, timeout, streamed, replace):
+    """-> (success, adb output)"""
+    if streamed:
+        success, message, timings = adb_client.install_streamed(
+            device_id, apk_path, install_args="-r" if replace else "", timeout=timeout)
+        phases = ", ".join(f"{phase} {seconds:.1f}s" for phase, seconds in timings.items())
+        if success:
+            print(f"Streamed install on {device_id}: {phases}")
+        else:
+            print(f"Install failed on {device_id}: {message} ({phases})")
+        return success, message
+
+    result = subprocess.run(
+        [ADB_PATH, "-s", device_id, "install"] + (["-r"] if replace else []) + [apk_path],
+        capture_output=True,
+        text=True,
+        timeout=timeout
+    )
+    if result.returncode == 0 and "Success" in result.stdout:
+        return True, result.stdout.strip()
+    print(f"Install failed on {device_id}: {(result.stderr or result.stdout).strip()}")
+    return False, result.stdout + result.stderr
@@ -2,6 +2,9 @@ import subprocess
 import os
 from datetime import datetime, timedelta, timezone
 
+import adb_client
+import device_registry
+
 FILEMASK = '*.mp4'
 DEST = r"E:\dest"
 TIME_DIFF = 1  # hours
@@ -14,19 +17,8 @@ def get_file_creation_time(device_id, file_info):
 
 
 def get_connected_devices():
-    devices_command = "adb devices -l"
-    devices_output = subprocess.check_output(
-        devices_command, shell=True, text=True)
-    devices_lines = devices_output.strip().split('\n')[1:]
-
-    devices = []
-    for line in devices_lines:
-        fields = line.split()
-        device_id = fields[0]
-        device_name = fields[-1]
-        devices.append({"id": device_id, "name": device_name})
-
-    return devices
+    return [{"id": dev["id"], "name": dev["model"]}
+            for dev in device_registry.get_registry().devices()]
 
 
 def select_device(devices):
@@ -74,7 +66,8 @@ def pull_files_recent(device_id, local_destination_folder):
     os.makedirs(local_destination_folder, exist_ok=True)
     current_time = datetime.now(timezone.utc)
 
-    # loop through list of files and pull files created within the last 24 hours
+    # loop through list of files and collect files created within the last TIME_DIFF hours
+    selected_files = []
     for file_info in file_list_info:
         # Split the file_info into creation time and file path
         creation_time_str, file_path = file_info.split(' ', 1)
@@ -91,15 +84,15 @@ def pull_files_recent(device_id, local_destination_folder):
         if current_time - creation_time < timedelta(hours=TIME_DIFF):
             local_pull_path = os.path.join(
                 local_destination_folder, os.path.basename(file_path))
-            pull_command = f'adb -s {device_id} pull "{file_path}" "{local_pull_path}"'
-            print(f"Executing pull command: {pull_command}")
-
-            result = subprocess.run(pull_command, shell=True, capture_output=True, text=True)
-
-            if result.returncode == 0:
-                print(f"File '{os.path.basename(file_path)}' created on {creation_time} pulled to '{local_pull_path}'")
-            else:
-                print(f"Failed to pull file '{file_path}': {result.stderr}")
+            selected_files.append((file_path, local_pull_path))
+
+    # pull all selected files over one adb sync session
+    print(f"Pulling {len(selected_files)} files from {device_id}")
+    for file_path, local_pull_path, _, error in adb_client.pull_files(device_id, selected_files):
+        if error is None:
+            print(f"File '{os.path.basename(file_path)}' pulled to '{local_pull_path}'")
+        else:
+            print(f"Failed to pull file '{file_path}': {error}")
 
 
 if __name__ == "__main__":
@@ -3,6 +3,9 @@ import os
 from datetime import datetime, timedelta
 from decouple import config
 
+import adb_client
+import device_registry
+
 
 def get_file_creation_time(device_id, file_info):
     # Split the file_info into creation time and file path
@@ -15,25 +18,8 @@ def get_file_creation_time(device_id, file_info):
 
 
 def get_connected_devices():
-    # Formulate the adb command to list connected devices
-    devices_command = "adb devices -l"
-
-    # Execute the adb command and capture the output
-    devices_output = subprocess.check_output(
-        devices_command, shell=True, text=True)
-
-    # Split the output into lines and skip the first line (header)
-    devices_lines = devices_output.strip().split('\n')[1:]
-
-    # Extract device IDs and names
-    devices = []
-    for line in devices_lines:
-        fields = line.split()
-        device_id = fields[0]
-        device_name = fields[-1]
-        devices.append({"id": device_id, "name": device_name})
-
-    return devices
+    return [{"id": dev["id"], "name": dev["model"]}
+            for dev in device_registry.get_registry().devices()]
 
 
 def select_device(devices):
@@ -85,8 +71,8 @@ def pull_files_recent(device_id, local_destination_folder):
     # Get the current time
     current_time = datetime.utcnow()
 
-    # Loop through the list of files and pull files created within the last 24
-    # hours
+    # Collect files created within the last 24 hours
+    selected_files = []
     for file_info in file_list_info:
         # Split the file_info into creation time and file path
         creation_time_str, file_path = file_info.split(' ', 1)
@@ -96,14 +82,18 @@ def pull_files_recent(device_id, local_destination_folder):
 
         # Check if the file was created within the last 24 hours
         if current_time - creation_time < timedelta(hours=24):
-            # Quote the file paths to handle spaces in file names
             local_pull_path = os.path.join(
                 local_destination_folder, os.path.basename(file_path))
-            pull_command = f'adb -s {device_id} pull "{file_path}" "{local_pull_path}"'
-            subprocess.run(pull_command, shell=True)
+            selected_files.append((file_path, local_pull_path))
+
+    # Pull all of them over one adb sync session
+    for file_path, local_pull_path, _, error in adb_client.pull_files(device_id, selected_files):
+        if error is None:
             print(
                 f"File '{
                 os.path.basename(file_path)}' pulled to '{local_pull_path}'")
+        else:
+            print(f"Failed to pull file '{file_path}': {error}")
 
 
 if __name__ == "__main__":
@@ -2,16 +2,34 @@
 
 import subprocess
 import os
-from datetime import datetime, timedelta, timezone
+import time
+from datetime import datetime
 import logging
 import argparse
+import re
+import shlex
+import shutil
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 
+import adb_client
+import device_registry
+import screen_capture
+import screenshots
+from android_capture import capture_devices
+from device_registry import safe_device_name
+from json_store import load_json, save_json
+
 # === Configuration ===
 ADB_PATH = "adb"
 DEFAULT_FILEMASK = "*.mp4"
+DEFAULT_ROOTS = ["/sdcard/"]
 DEFAULT_DEST = os.getenv("ADB_DEST", r"E:\\dest")
 DEFAULT_TIME_DIFF = int(os.getenv("TIME_DIFF", "1"))
+DEFAULT_DEVICE_WORKERS = 2  # parallel sync sessions per device
+DEFAULT_MAX_WORKERS = 8  # parallel transfers across all devices
+LISTING_STATUS = "listing-exit-status:"  # last line of a file listing, followed by find's exit code
 
 # === Setup logging ===
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -20,6 +38,13 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 # === ADB Utilities ===
 def execute_adb_command(args: List[str], device_id: Optional[str] = None,
                         capture_output: bool = True) -> subprocess.CompletedProcess:
+    # Captured commands go through the adb server socket when possible (no process spawn)
+    if capture_output and adb_client.USE_NATIVE_ADB:
+        try:
+            return adb_client.execute_native(args, device_id)
+        except adb_client.AdbUnavailable:
+            pass
+
     cmd = [ADB_PATH]
     if device_id:
         cmd.extend(["-s", device_id])
@@ -35,15 +60,7 @@ def execute_adb_command(args: List[str], device_id: Optional[str] = None,
 
 
 def get_connected_devices() -> List[Dict[str, str]]:
-    result = execute_adb_command(["devices", "-l"])
-    lines = result.stdout.strip().split('\n')[1:]
-
-    devices = []
-    for line in lines:
-        if line.strip():
-            parts = line.split()
-            devices.append({"id": parts[0], "name": parts[-1] if len(parts) > 1 else "unknown"})
-    return devices
+    return [{"id": dev["id"], "name": dev["model"]} for dev in device_registry.get_registry().devices()]
 
 
 def select_device(devices: List[Dict[str, str]]) -> str:
@@ -75,10 +92,23 @@ def uninstall_app(bundle_identifier: str, device_id: str) -> bool:
         return False
 
 
-def install_app(apk_path: str, device_id: str) -> bool:
-    result = execute_adb_command(["install", apk_path], device_id)
+def install_app(apk_paths, device_id: str, streamed: bool = False) -> bool:
+    """apk_paths: one APK, a folder of split APKs or a list of APKs.
+     streamed writes them into a package manager session without a copy on the device"""
+    if streamed:
+        success, message, timings = adb_client.install_streamed(device_id, apk_paths)
+        phases = ", ".join(f"{phase} {seconds:.1f}s" for phase, seconds in timings.items())
+        if success:
+            logging.info(f"Installed {apk_paths} on {device_id} ({phases})")
+        else:
+            logging.error(f"Install failed: {message} ({phases})")
+        return success
+
+    apks = adb_client.collect_apks(apk_paths)
+    command = (["install"] if len(apks) == 1 else ["install-multiple"]) + apks
+    result = execute_adb_command(command, device_id)
     if result.returncode == 0:
-        logging.info(f"Installed {apk_path} on {device_id}")
+        logging.info(f"Installed {apk_paths} on {device_id}")
         return True
     else:
         logging.error(f"Install failed: {result.stderr.strip()}")
@@ -86,56 +116,294 @@ def install_app(apk_path: str, device_id: str) -> bool:
 
 
 # === File Operations ===
-def pull_recent_files(device_id: str, dest_folder: str, filemask: str = DEFAULT_FILEMASK,
-                      time_diff_hours: int = DEFAULT_TIME_DIFF):
-    list_cmd = f"find /sdcard/ -type f -name '{filemask}' -exec stat -c '%Y %n' {{}} +"
-    result = execute_adb_command(["shell", list_cmd], device_id)
+def build_find_filter(filemasks, roots=DEFAULT_ROOTS, max_age_minutes: Optional[int] = None) -> str:
+    """find expression that does the filtering on the device: roots, any of filemasks, and age"""
+    if isinstance(filemasks, str):
+        filemasks = [filemasks]
+    names = " -o ".join(f"-name {shlex.quote(mask)}" for mask in filemasks)
+    cmd = f"find {' '.join(shlex.quote(root) for root in roots)} -type f \\( {names} \\)"
+    if max_age_minutes:
+        cmd += f" -mmin -{max_age_minutes}"
+    return cmd
+
+
+def build_find_command(filemasks, roots=DEFAULT_ROOTS, max_age_minutes: Optional[int] = None) -> str:
+    """Filtered find printing '<mtime> <size> <path>' per file"""
+    return build_find_filter(filemasks, roots, max_age_minutes) + " -exec stat -c '%Y %s %n' {} +"
+
+
+def iter_remote_files(device_id: str, filemasks=DEFAULT_FILEMASK, roots=DEFAULT_ROOTS,
+                      max_age_minutes: Optional[int] = None):
+    """Yield (mtime, size, remote_path) while the device-side find is still running.
+     A non-zero exit of find (missing root, unreadable folder) is logged as a failed listing,
+     the files it did find are still yielded. Raises RuntimeError when the listing never finished"""
+    list_cmd = f"{build_find_command(filemasks, roots, max_age_minutes)}; echo {LISTING_STATUS}$?"
+    status = None
+    unparsed = []
+    for line in adb_client.iter_output_lines(device_id, list_cmd):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith(LISTING_STATUS):
+            status = int(line[len(LISTING_STATUS):] or -1)
+            continue
+        try:
+            mtime, size, path = line.split(' ', 2)
+            yield int(mtime), int(size), path
+        except ValueError:
+            unparsed.append(line)  # find's stderr shares the stream
 
-    if result.returncode != 0:
-        logging.error(f"File listing failed: {result.stderr.strip()}")
-        return
+    if status is None:
+        raise RuntimeError(f"File listing failed on {device_id}: no answer from the device")
+    if status != 0:
+        details = f": {'; '.join(unparsed)}" if unparsed else ""
+        logging.error(f"[{device_id}] File listing failed (find exit status {status}){details}")
+    else:
+        for line in unparsed:
+            logging.error(f"Failed to parse file info line '{line}'")
 
-    files_info = [line.strip() for line in result.stdout.strip().split('\n') if line.strip()]
-    if not files_info:
-        logging.info("No matching files found.")
-        return
 
+def select_recent_files(device_id: str, dest_folder: str, filemask=DEFAULT_FILEMASK,
+                        time_diff_hours: int = DEFAULT_TIME_DIFF, roots=DEFAULT_ROOTS) -> List[tuple]:
+    """List files on the device and return (remote_path, local_path) pairs to pull"""
     os.makedirs(dest_folder, exist_ok=True)
-    now = datetime.now(timezone.utc)
+    selected = [(path, os.path.join(dest_folder, os.path.basename(path)))
+                for _, _, path in iter_remote_files(device_id, filemask, roots, time_diff_hours * 60)]
+    if not selected:
+        logging.info(f"[{device_id}] No matching files found.")
+    return selected
+
+
+def pull_recent_files(device_id: str, dest_folder: str, filemask=DEFAULT_FILEMASK,
+                      time_diff_hours: int = DEFAULT_TIME_DIFF, roots=DEFAULT_ROOTS) -> int:
+    selected = select_recent_files(device_id, dest_folder, filemask, time_diff_hours, roots)
+    return bulk_pull(device_id, selected)
+
+
+def device_has_tar(device_id: str) -> bool:
+    """tar on the device that takes the file list from stdin (-T), as pull_recent_files_tar needs"""
+    result = execute_adb_command(["shell", "tar -cf /dev/null -T /dev/null 2>/dev/null && echo ok"], device_id)
+    return result.returncode == 0 and result.stdout.strip() == "ok"
+
+
+def pull_recent_files_tar(device_id: str, dest_folder: str, filemask=DEFAULT_FILEMASK,
+                          time_diff_hours: int = DEFAULT_TIME_DIFF, roots=DEFAULT_ROOTS) -> int:
+    """Same selection as pull_recent_files, but the device packs it with tar into one exec-out
+     stream that is unpacked into dest_folder while it arrives. Falls back to per-file pull
+     when the device has no usable tar, or when tar sent nothing although files match. Returns bytes written"""
+    if not device_has_tar(device_id):
+        logging.warning(f"[{device_id}] tar not available on device, pulling file by file")
+        return pull_recent_files(device_id, dest_folder, filemask, time_diff_hours, roots)
 
-    for line in files_info:
+    os.makedirs(dest_folder, exist_ok=True)
+    # exec: carries stderr in the same stream as stdout, so nothing but tar may write to it
+    tar_cmd = (f"{{ {build_find_filter(filemask, roots, time_diff_hours * 60)} -print; }} 2>/dev/null"
+               f" | tar -cf - -T - 2>/dev/null")
+    started = time.monotonic()
+    total = count = 0
+    with adb_client.open_output_stream(device_id, tar_cmd) as stream:
+        try:
+            archive = tarfile.open(fileobj=stream, mode="r|")
+        except tarfile.ReadError as e:
+            # tar writes nothing at all when find selected no files, but also when tar itself
+            # failed (its stderr is dropped): the per-file path tells the two apart
+            if str(e) != "empty file":
+                raise
+            return pull_recent_files(device_id, dest_folder, filemask, time_diff_hours, roots)
+        with archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                local_path = os.path.join(dest_folder, os.path.basename(member.name))
+                tmp_path = local_path + ".part"
+                source = archive.extractfile(member)
+                try:
+                    with open(tmp_path, "wb") as target:
+                        shutil.copyfileobj(source, target, adb_client.SYNC_DATA_MAX)
+                    os.utime(tmp_path, (member.mtime, member.mtime))
+                    os.replace(tmp_path, local_path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                total += member.size
+                count += 1
+                logging.info(f"[{device_id}] Extracted {os.path.basename(member.name)} to {local_path}")
+
+    elapsed = max(time.monotonic() - started, 1e-6)
+    logging.info(f"[{device_id}] Pulled {count} files as one tar stream, {total / (1024 * 1024):.1f} MB "
+                 f"in {elapsed:.1f}s ({total / elapsed / (1024 * 1024):.1f} MB/s)")
+    return total
+
+
+def bulk_pull(device_id: str, files: List[tuple]) -> int:
+    """Pull (remote_path, local_path) pairs over a single sync session. Returns bytes pulled"""
+    if not files:
+        logging.info(f"[{device_id}] No files selected for pull.")
+        return 0
+
+    started = time.monotonic()
+    total = pulled = 0
+    for path, local_path, size, error in adb_client.pull_files(device_id, files):
+        if error is None:
+            total += size
+            pulled += 1
+            logging.info(f"[{device_id}] Pulled {os.path.basename(path)} to {local_path}")
+        else:
+            logging.warning(f"[{device_id}] Failed to pull {path}: {error}")
+
+    elapsed = max(time.monotonic() - started, 1e-6)
+    logging.info(f"[{device_id}] Pulled {pulled}/{len(files)} files, {total / (1024 * 1024):.1f} MB "
+                 f"in {elapsed:.1f}s ({total / elapsed / (1024 * 1024):.1f} MB/s)")
+    return total
+
+
+def device_folder(dest_folder: str, device_id: str) -> str:
+    """Per-device subfolder of dest_folder"""
+    return os.path.join(dest_folder, safe_device_name(device_id))
+
+
+def pull_recent_files_all_devices(device_ids: List[str], dest_folder: str, filemask=DEFAULT_FILEMASK,
+                                  time_diff_hours: int = DEFAULT_TIME_DIFF,
+                                  device_workers: int = DEFAULT_DEVICE_WORKERS,
+                                  max_workers: int = DEFAULT_MAX_WORKERS,
+                                  roots=DEFAULT_ROOTS, tar: bool = False) -> Dict[str, int]:
+    """Pull recent files from every device at once into dest_folder/<device id>.
+     Each device gets up to device_workers sync sessions (or one tar stream with tar),
+     max_workers bounds all transfers. A device that fails is logged and left out of the
+     result, the others carry on. Returns bytes pulled per device"""
+    if not device_ids:
+        return {}
+    started = time.monotonic()
+    if tar:
+        totals, errors = run_per_device(
+            lambda device_id: pull_recent_files_tar(device_id, device_folder(dest_folder, device_id),
+                                                    filemask, time_diff_hours, roots),
+            device_ids, max_workers)
+        log_device_summary("Pulled from", device_ids, totals, errors, started)
+        return totals
+
+    selections, errors = run_per_device(
+        lambda device_id: select_recent_files(device_id, device_folder(dest_folder, device_id),
+                                              filemask, time_diff_hours, roots),
+        device_ids, max_workers)
+
+    totals = {device_id: 0 for device_id in selections}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        jobs = []
+        for device_id, selected in selections.items():
+            workers = max(1, min(device_workers, len(selected)))
+            for chunk in (selected[i::workers] for i in range(workers)):
+                if chunk:
+                    jobs.append((device_id, pool.submit(bulk_pull, device_id, chunk)))
+        for device_id, future in jobs:
+            try:
+                totals[device_id] += future.result()
+            except Exception as e:
+                logging.error(f"[{device_id}] Pull failed: {e}")
+                errors.setdefault(device_id, e)
+    for device_id in errors:
+        totals.pop(device_id, None)
+
+    log_device_summary("Pulled from", device_ids, totals, errors, started)
+    return totals
+
+
+def run_per_device(func, device_ids: List[str], max_workers: int = DEFAULT_MAX_WORKERS):
+    """Call func(device_id) for every device in parallel. An exception on one device is logged
+     and does not stop the others. Returns ({device_id: result}, {device_id: exception})"""
+    results, errors = {}, {}
+
+    def call(device_id):
         try:
-            ts_str, path = line.split(' ', 1)
-            ctime = datetime.fromtimestamp(int(ts_str), tz=timezone.utc)
-
-            if now - ctime < timedelta(hours=time_diff_hours):
-                filename = os.path.basename(path)
-                local_path = os.path.join(dest_folder, filename)
-                result = execute_adb_command(["pull", path, local_path], device_id)
-
-                if result.returncode == 0:
-                    logging.info(f"Pulled {filename} to {local_path}")
-                else:
-                    logging.warning(f"Failed to pull {path}: {result.stderr.strip()}")
+            results[device_id] = func(device_id)
         except Exception as e:
-            logging.error(f"Failed to parse file info line '{line}': {e}")
+            logging.error(f"[{device_id}] {e}")
+            errors[device_id] = e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(device_ids)))) as pool:
+        list(pool.map(call, device_ids))
+    return results, errors
+
+
+def log_device_summary(action: str, device_ids: List[str], totals: Dict[str, int], errors: Dict[str, Exception],
+                       started: float):
+    logging.info(f"{action} {len(totals)}/{len(device_ids)} devices in {time.monotonic() - started:.1f}s")
+    for device_id in device_ids:
+        if device_id in errors:
+            logging.info(f"  {device_id}: FAILED ({errors[device_id]})")
+        else:
+            logging.info(f"  {device_id}: {totals.get(device_id, 0) / (1024 * 1024):.1f} MB")
+
+
+def list_remote_files(device_id: str, filemask=DEFAULT_FILEMASK, roots=DEFAULT_ROOTS) -> List[tuple]:
+    """Return (mtime, size, remote_path) for every file under roots matching filemask"""
+    return list(iter_remote_files(device_id, filemask, roots))
+
+
+def manifest_path(dest_folder: str, device_id: str) -> str:
+    return os.path.join(dest_folder, f".pull_manifest_{safe_device_name(device_id)}.json")
+
+
+def sync_files(device_id: str, dest_folder: str, filemask=DEFAULT_FILEMASK, roots=DEFAULT_ROOTS) -> int:
+    """Pull only files that are new or changed (mtime/size) since the last sync.
+     The per-device manifest in dest_folder remembers what was pulled. Returns bytes pulled"""
+    os.makedirs(dest_folder, exist_ok=True)
+    path = manifest_path(dest_folder, device_id)
+    manifest = load_json(path)
+
+    remote_files = list_remote_files(device_id, filemask, roots)
+    changed = {}
+    for mtime, size, remote_path in remote_files:
+        local_path = os.path.join(dest_folder, os.path.basename(remote_path))
+        entry = {"mtime": mtime, "size": size, "local_path": local_path}
+        if manifest.get(remote_path) != entry or not os.path.exists(local_path):
+            changed[remote_path] = entry
+
+    logging.info(f"[{device_id}] {len(remote_files) - len(changed)} files unchanged, "
+                 f"{len(changed)} to transfer")
+    if not changed:
+        return 0
+
+    total = 0
+    try:
+        for remote_path, local_path, size, error in adb_client.pull_files(
+                device_id, [(remote, entry["local_path"]) for remote, entry in changed.items()]):
+            if error is None:
+                manifest[remote_path] = changed[remote_path]
+                total += size
+                logging.info(f"[{device_id}] Pulled {os.path.basename(remote_path)} to {local_path}")
+            else:
+                logging.warning(f"[{device_id}] Failed to pull {remote_path}: {error}")
+    finally:
+        save_json(path, manifest, indent=2)
+    return total
 
 
 # Pull recent .mp4 files from a device
 # py adb_tool_v2.py --pull-recent
 # Install an APK
 # py adb_tool_v2.py --install path/to/app.apk
+# Install split APKs straight into a package manager session
+# py adb_tool_v2.py --install path/to/splits/ --streamed
 # Uninstall an app
 # py adb_tool_v2.py --uninstall com.example.app
 # Pull only .jpg files from last 2 hours to a custom folder
 # py adb_tool_v2.py --pull-recent --mask "*.jpg" --hours 2 --dest "D:/media"
+# Pull screenshots and videos from the camera folder only
+# py adb_tool_v2.py --pull-recent --mask "*.jpg" "*.png" "*.mp4" --root /sdcard/DCIM
+# Pull only new or changed .mp4 files since the previous --sync run
+# py adb_tool_v2.py --sync --dest "D:/media"
+# Record the screen straight to the PC (mp4 with ffmpeg on PATH, .h264 otherwise)
+# py adb_tool_v2.py --capture --type n --mode rec --t ABC-123 --stream
+# Record every connected device at once, one SPACE stops all
+# py adb_tool_v2.py --capture --type v --mode rec --t ABC-123 --all-devices
+# 5 screenshots per second for 3 seconds, numbered ABC-123_..._0001.png ...
+# py adb_tool_v2.py --capture --type n --mode scr --t ABC-123 --burst 5 --duration 3
 
 
 # === New Capture Utilities ===
-import re
 import sys
 import threading
-import msvcrt  # works on Windows for key press
 
 
 def sanitize_jira_task(jira_input: str) -> str:
@@ -156,34 +424,32 @@ def build_filename(capture_type: str, jira_task: str, platf: str, env: str, mode
 
 def take_screenshot(device_id: str, local_dest: str, filename: str):
     """
-    Take a screenshot, pull it locally, and clean up remote file.
+    Take a screenshot straight to the PC: the raw framebuffer is read over exec-out and
+    encoded as PNG here, nothing is written on the device.
     Always handles errors gracefully.
     """
-    remote_path = f"/sdcard/{filename}"
     print("📸 Taking screenshot...")
-
+    local_path = os.path.join(local_dest, filename)
     try:
-        # Take screenshot on device
-        result = execute_adb_command(["shell", "screencap", "-p", remote_path], device_id)
-        if result.returncode != 0:
-            logging.error(f"Failed to take screenshot: {result.stderr.strip()}")
-            return
-
-        # Ensure destination exists
-        os.makedirs(local_dest, exist_ok=True)
-        local_path = os.path.join(local_dest, filename)
-
-        # Pull screenshot
-        result = execute_adb_command(["pull", remote_path, local_path], device_id)
-        if result.returncode != 0:
-            logging.error(f"Failed to pull screenshot: {result.stderr.strip()}")
-            return
+        screenshots.take_screenshot(device_id, local_path).result()
+    except Exception as e:
+        logging.error(f"Failed to take screenshot: {e}")
+        return
+    print(f"✅ Saved: {local_path}")
 
-        print(f"✅ Saved: {local_path}")
 
-    finally:
-        # Cleanup: remove remote file, even if pull failed
-        execute_adb_command(["shell", "rm", "-f", remote_path], device_id)
+def take_burst(device_id: str, local_dest: str, filename: str, rate: float, duration: float,
+               dedupe: bool = True, stop_event: Optional[threading.Event] = None):
+    """rate screenshots per second for duration seconds, saved as <filename>_0001.png, ...
+    dedupe skips screenshots identical to the previous one, stop_event ends the burst early"""
+    print(f"📸 Taking {rate:g} screenshots per second for {duration:g}s...")
+    try:
+        paths = screenshots.burst(device_id, local_dest, os.path.splitext(filename)[0], rate, duration,
+                                  dedupe=dedupe, stop_event=stop_event)
+    except Exception as e:
+        logging.error(f"Burst failed: {e}")
+        return
+    print(f"✅ Saved {len(paths)} screenshots to {local_dest}")
 
 
 def wait_for_space(stop_event):
@@ -211,11 +477,18 @@ def wait_for_space(stop_event):
             termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
 
 
-def record_screen(device_id: str, local_dest: str, filename: str):
+def record_screen(device_id: str, local_dest: str, filename: str, stream: bool = False,
+                  stop_event: Optional[threading.Event] = None):
     """
-    Start screen recording. Stop with SPACE (preferred) or Ctrl+C (fallback).
-    Always pulls and deletes the remote file afterwards.
+    Start screen recording. Stop with SPACE (preferred) or Ctrl+C (fallback),
+    or through stop_event when the caller passes one.
+    Always pulls and deletes the remote file afterwards, unless stream is set:
+    then the video goes straight to the PC over exec-out and nothing is stored on the device.
     """
+    if stream:
+        record_screen_streamed(device_id, local_dest, filename, stop_event)
+        return
+
     remote_path = f"/sdcard/{filename}"
     print("🎥 Recording started... Press SPACE or Ctrl+C to stop")
 
@@ -224,9 +497,10 @@ def record_screen(device_id: str, local_dest: str, filename: str):
         stdout=subprocess.PIPE, stderr=subprocess.PIPE
     )
 
-    stop_event = threading.Event()
-    listener = threading.Thread(target=wait_for_space, args=(stop_event,), daemon=True)
-    listener.start()
+    if stop_event is None:
+        stop_event = threading.Event()
+        listener = threading.Thread(target=wait_for_space, args=(stop_event,), daemon=True)
+        listener.start()
 
     try:
         while not stop_event.is_set():
@@ -250,28 +524,97 @@ def record_screen(device_id: str, local_dest: str, filename: str):
     print(f"✅ Saved: {local_path}")
 
 
+def record_screen_streamed(device_id: str, local_dest: str, filename: str,
+                           stop_event: Optional[threading.Event] = None):
+    """Stream screenrecord output into a local file while recording, stop with SPACE or Ctrl+C"""
+    print("🎥 Recording started (streaming to PC)... Press SPACE or Ctrl+C to stop")
+    if stop_event is None:
+        stop_event = threading.Event()
+        listener = threading.Thread(target=wait_for_space, args=(stop_event,), daemon=True)
+        listener.start()
+
+    local_path = os.path.join(local_dest, filename)
+    try:
+        local_path = screen_capture.record_stream(device_id, local_path, stop_event)
+    except KeyboardInterrupt:
+        print("\n⏹️ Ctrl+C detected, stopping recording...")
+    except (RuntimeError, OSError, adb_client.AdbError) as e:
+        logging.error(f"Recording failed: {e}")
+        return
+    finally:
+        stop_event.set()
+    print(f"✅ Saved: {local_path}")
+
+
 def android_capture(device_id: str, capture_type: str, mode: str, jira_task: str, platf: str, env: str,
-                    dest_folder: str):
+                    dest_folder: str, stream: bool = False, burst: float = None, duration: float = None,
+                    dedupe: bool = True):
     # platf = "AND" #add later: logic to identify capture mechanism (adb or xcode), when iOS capture is added
 
     filename = build_filename(capture_type, jira_task, platf, env, mode)
-    if mode == "scr":
+    if mode == "scr" and burst:
+        take_burst(device_id, dest_folder, filename, burst, duration, dedupe)
+    elif mode == "scr":
         take_screenshot(device_id, dest_folder, filename)
     elif mode == "rec":
-        record_screen(device_id, dest_folder, filename)
+        record_screen(device_id, dest_folder, filename, stream)
     else:
         logging.error("Invalid mode. Use 'scr' for screenshot or 'rec' for recording.")
 
 
+def android_capture_all(device_ids: List[str], capture_type: str, mode: str, jira_task: str, platf: str,
+                        env: str, dest_folder: str, stream: bool = False, burst: float = None,
+                        duration: float = None, dedupe: bool = True):
+    """Capture on several devices at once. Files share one timestamp and get the device id appended,
+    the capture threads are released together and one SPACE / Ctrl+C stops every recording or burst"""
+    if mode not in ("scr", "rec"):
+        logging.error("Invalid mode. Use 'scr' for screenshot or 'rec' for recording.")
+        return
+    stop_event = threading.Event()
+
+    def capture(device_id, path):
+        dest, filename = os.path.split(path)
+        if mode == "scr" and burst:
+            take_burst(device_id, dest, filename, burst, duration, dedupe, stop_event)
+        elif mode == "scr":
+            take_screenshot(device_id, dest, filename)
+        else:
+            record_screen(device_id, dest, filename, stream, stop_event)
+
+    if mode == "rec":
+        threading.Thread(target=wait_for_space, args=(stop_event,), daemon=True).start()
+    capture_devices(
+        device_ids, os.path.join(dest_folder, build_filename(capture_type, jira_task, platf, env, mode)),
+        capture, stop_event)
+    stop_event.set()
+
+
 # === CLI Interface ===
 def main():
     parser = argparse.ArgumentParser(description="ADB Utility Tool")
     parser.add_argument("--uninstall", help="Uninstall app by bundle identifier")
-    parser.add_argument("--install", help="Install APK file path")
+    parser.add_argument("--install", nargs="+",
+                        help="Install APK file path (several paths or a folder for split APKs)")
+    parser.add_argument("--streamed", action="store_true",
+                        help="With --install: stream the APKs into a package manager session")
     parser.add_argument("--pull-recent", action="store_true", help="Pull recent media files")
-    parser.add_argument("--mask", default=DEFAULT_FILEMASK, help="Filemask for pulling files")
+    parser.add_argument("--mask", nargs="+", default=[DEFAULT_FILEMASK],
+                        help="One or more filemasks for pulling files")
+    parser.add_argument("--root", action="append", dest="roots",
+                        help="Device folder to search, can be repeated (default /sdcard/)")
     parser.add_argument("--dest", default=DEFAULT_DEST, help="Destination directory for pulled files")
     parser.add_argument("--hours", type=int, default=DEFAULT_TIME_DIFF, help="How recent (in hours) to pull files")
+    parser.add_argument("--tar", action="store_true",
+                        help="With --pull-recent: stream the selection as one tar archive (many small files)")
+    parser.add_argument("--sync", action="store_true",
+                        help="Pull only files that are new or changed since the last --sync (ignores --hours)")
+    parser.add_argument("--all-devices", action="store_true",
+                        help="Pull from every connected device at once, into <dest>/<device id>; "
+                             "with --capture record/screenshot all devices together")
+    parser.add_argument("--device-workers", type=int, default=DEFAULT_DEVICE_WORKERS,
+                        help="Parallel transfers per device with --all-devices")
+    parser.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS,
+                        help="Parallel transfers across all devices with --all-devices")
 
     parser.add_argument("--capture", action="store_true", help="Capture screenshot or recording")
     parser.add_argument("--type", choices=["v", "n"], help="Prefix type: v=verified, n=normal")
@@ -279,6 +622,13 @@ def main():
     parser.add_argument("--t", dest="task", help="Jira task ID or URL")
     parser.add_argument("--platf", required=False, default="AND")
     parser.add_argument("--env", required=False, default="DEV", help="Environment string")
+    parser.add_argument("--stream", action="store_true",
+                        help="With --mode rec: stream the recording to the PC (no /sdcard copy, no pull)")
+    parser.add_argument("--burst", type=float, help="With --mode scr: screenshots per second")
+    parser.add_argument("--duration", type=float, default=screenshots.DEFAULT_BURST_DURATION,
+                        help="Seconds a --burst runs")
+    parser.add_argument("--keep-duplicates", action="store_true",
+                        help="With --burst: keep screenshots identical to the previous one")
 
     args = parser.parse_args()
 
@@ -287,20 +637,48 @@ def main():
         logging.error("No devices connected.")
         return
 
+    roots = args.roots or DEFAULT_ROOTS
+
+    if args.all_devices:
+        device_ids = [dev["id"] for dev in devices]
+        if args.sync:
+            started = time.monotonic()
+            totals, errors = run_per_device(
+                lambda dev_id: sync_files(dev_id, device_folder(args.dest, dev_id), args.mask, roots),
+                device_ids, args.max_workers)
+            log_device_summary("Synced", device_ids, totals, errors, started)
+        elif args.pull_recent:
+            pull_recent_files_all_devices(device_ids, args.dest, args.mask, args.hours,
+                                          args.device_workers, args.max_workers, roots, args.tar)
+        if args.capture:
+            if not args.type or not args.mode or not args.task:
+                logging.error("Missing required args: --type, --mode, --t")
+                return
+            android_capture_all(device_ids, args.type, args.mode, args.task, args.platf, args.env, args.dest,
+                                args.stream, args.burst, args.duration, not args.keep_duplicates)
+        if args.uninstall or args.install:
+            logging.error("--all-devices only applies to --pull-recent, --sync and --capture")
+        return
+
     device_id = select_device(devices)
 
     if args.uninstall:
         uninstall_app(args.uninstall, device_id)
     if args.install:
-        install_app(args.install, device_id)
-    if args.pull_recent:
-        pull_recent_files(device_id, args.dest, args.mask, args.hours)
+        install_app(args.install, device_id, streamed=args.streamed)
+    if args.sync:
+        sync_files(device_id, args.dest, args.mask, roots)
+    elif args.pull_recent and args.tar:
+        pull_recent_files_tar(device_id, args.dest, args.mask, args.hours, roots)
+    elif args.pull_recent:
+        pull_recent_files(device_id, args.dest, args.mask, args.hours, roots)
 
     if args.capture:
         if not args.type or not args.mode or not args.task:
             logging.error("Missing required args: --type, --mode, --t")
             return
-        android_capture(device_id, args.type, args.mode, args.task, args.platf, args.env, args.dest)
+        android_capture(device_id, args.type, args.mode, args.task, args.platf, args.env, args.dest,
+                        args.stream, args.burst, args.duration, not args.keep_duplicates)
 
 
 if __name__ == "__main__":
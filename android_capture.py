@@ -1,17 +1,21 @@
 import subprocess
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import time
 import os
 import signal
 
+import device_registry
+import screen_capture
+import screenshots
+
 
 def get_default_device() -> str:
     """Return the first connected Android device via adb, or raise an error."""
     try:
-        result = subprocess.run(["adb", "devices"], capture_output=True, text=True)
-        lines = result.stdout.strip().splitlines()[1:]  # skip header
-        devices = [line.split()[0] for line in lines if "device" in line]
+        devices = device_registry.get_registry().device_ids()
         if not devices:
             raise RuntimeError("No Android devices connected.")
         return devices[0]
@@ -22,7 +26,7 @@ def get_default_device() -> str:
 def build_filename(capture_type: str, jira_task: str, platf: str, bff: str, cas: str, mode: str) -> str:
     """Builds a standardized filename."""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-    ext = "mp4" if mode == "rec" else "png"
+    ext = "mp4" if mode == "rec" else "png"  # burst: prefix of the numbered png files
 
     parts = []
     if capture_type == "v":
@@ -47,17 +51,97 @@ def build_filename(capture_type: str, jira_task: str, platf: str, bff: str, cas:
 
 def android_capture(device_id: str, capture_type: str, mode: str,
                     jira_task: str, platf: str, dest_folder: str,
-                    bff: str = "", cas: str = "", stop_event=None):
-    """Handles Android screen recording or screenshot."""
+                    bff: str = "", cas: str = "", stop_event=None, stream: bool = False,
+                    burst_rate: float = screenshots.DEFAULT_BURST_RATE,
+                    burst_duration: float = screenshots.DEFAULT_BURST_DURATION):
+    """Handles Android screen recording, screenshot or screenshot burst.
+     stream: record straight to the PC over exec-out instead of /sdcard + pull
+     burst_rate / burst_duration: shots per second and length in seconds of a burst"""
     filename = build_filename(capture_type, jira_task, platf, bff, cas, mode)
-    dest_path = os.path.join(dest_folder, filename)
+    capture_to(device_id, os.path.join(dest_folder, filename), mode, stop_event, stream,
+               burst_rate, burst_duration)
+
+
+def android_capture_multi(device_ids, capture_type: str, mode: str,
+                          jira_task: str, platf: str, dest_folder: str,
+                          bff: str = "", cas: str = "", stop_event=None, stream: bool = False,
+                          burst_rate: float = screenshots.DEFAULT_BURST_RATE,
+                          burst_duration: float = screenshots.DEFAULT_BURST_DURATION):
+    """Capture on several devices at once: one start, one stop_event for all recordings,
+     see capture_devices. Raises RuntimeError when a device failed"""
+    dest_path = os.path.join(dest_folder, build_filename(capture_type, jira_task, platf, bff, cas, mode))
+    errors = capture_devices(
+        device_ids, dest_path,
+        lambda device_id, path: capture_to(device_id, path, mode, stop_event, stream, burst_rate, burst_duration),
+        stop_event)
+    if errors:
+        raise RuntimeError(f"{len(errors)} of {len(device_ids)} devices failed")
+
+
+def capture_devices(device_ids, dest_path: str, capture, stop_event=None):
+    """Run capture(device_id, path) on every device in parallel. path is dest_path with the
+     device id appended, so the files share one timestamp. The threads are released together
+     so the captures start aligned; Ctrl+C sets stop_event. Returns {device_id: exception}"""
+    base, ext = os.path.splitext(dest_path)
+    barrier = threading.Barrier(len(device_ids))
+    started = {}
+    errors = {}
+
+    def run(device_id):
+        path = f"{base}_{device_registry.safe_device_name(device_id)}{ext}"
+        barrier.wait()
+        started[device_id] = time.monotonic()
+        capture(device_id, path)
+
+    with ThreadPoolExecutor(max_workers=len(device_ids)) as pool:
+        futures = {pool.submit(run, device_id): device_id for device_id in device_ids}
+        try:
+            while not all(future.done() for future in futures):
+                time.sleep(0.1)
+        except KeyboardInterrupt:
+            print("\n⏹️ Ctrl+C detected, stopping all captures...")
+            if stop_event is not None:
+                stop_event.set()
+        for future, device_id in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                logging.error(f"[{device_id}] Capture failed: {e}")
+                errors[device_id] = e
+
+    if started:
+        spread = (max(started.values()) - min(started.values())) * 1000
+        logging.info(f"Captured {len(started)} devices, start offsets within {spread:.0f} ms")
+    return errors
+
+
+def capture_to(device_id: str, dest_path: str, mode: str, stop_event=None, stream: bool = False,
+               burst_rate: float = screenshots.DEFAULT_BURST_RATE,
+               burst_duration: float = screenshots.DEFAULT_BURST_DURATION):
+    """Screenshot, burst or recording of one device into dest_path"""
+    if mode == "burst":
+        logging.info(f"📸 Burst: {burst_rate:g} screenshots per second for {burst_duration:g}s...")
+        base, _ = os.path.splitext(dest_path)
+        paths = screenshots.burst(device_id, os.path.dirname(dest_path), os.path.basename(base),
+                                  burst_rate, burst_duration, stop_event=stop_event)
+        logging.info(f"✅ Burst saved: {len(paths)} screenshots as {base}_0001.png ...")
+        return
 
     if mode == "scr":
         logging.info("📸 Taking screenshot...")
-        subprocess.run(["adb", "-s", device_id, "exec-out", "screencap", "-p"], stdout=open(dest_path, "wb"))
+        screenshots.take_screenshot(device_id, dest_path).result()
         logging.info(f"✅ Screenshot saved: {dest_path}")
         return
 
+    if mode == "rec" and stream:
+        logging.info("🎥 Recording started (streaming to PC)... Press STOP in GUI to finish.")
+        try:
+            saved_path = screen_capture.record_stream(device_id, dest_path, stop_event)
+            logging.info(f"✅ Recording saved: {saved_path}")
+        except Exception as e:
+            logging.error(f"Recording failed: {e}")
+        return
+
     if mode == "rec":
         logging.info("🎥 Recording started... Press STOP in GUI to finish.")
 
@@ -0,0 +1,101 @@
+import hashlib
+import os
+import time
+from decouple import config
+
+from json_store import load_json, save_json
+
+INDEX_FILENAME = "apk_index.json"
+HASH_CHUNK_SIZE = 1024 * 1024
+DEFAULT_MAX_SIZE_MB = 2048
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ApkCache:
+    """Content-addressed APK store: files are kept as '<sha256>.apk' in folder,
+     apk_index.json maps '<bundle id>:<version>' to sha256, size and last use.
+     The folder is kept under max_size_mb by evicting least recently used builds"""
+
+    def __init__(self, folder, max_size_mb=None):
+        self.folder = folder
+        if max_size_mb is None:
+            max_size_mb = config("APK_CACHE_MAX_MB", default=DEFAULT_MAX_SIZE_MB, cast=int)
+        self.max_size = max_size_mb * 1024 * 1024
+        self.index_path = os.path.join(folder, INDEX_FILENAME)
+        os.makedirs(folder, exist_ok=True)
+        self.entries = self._load_index()
+
+    @staticmethod
+    def key(bundle_id, version):
+        return f"{bundle_id}:{version}"
+
+    def get(self, bundle_id, version):
+        """Return the cached APK path for bundle_id/version or None on a miss"""
+        entry = self.entries.get(self.key(bundle_id, version))
+        if not entry:
+            return None
+        path = self._blob_path(entry["sha256"])
+        if not os.path.exists(path) or os.path.getsize(path) != entry["size"]:
+            del self.entries[self.key(bundle_id, version)]
+            self._save_index()
+            return None
+        entry["last_used"] = time.time()
+        self._save_index()
+        return path
+
+    def add(self, bundle_id, version, apk_path):
+        """Move a freshly downloaded APK into the cache and return its cached path"""
+        sha256 = file_sha256(apk_path)
+        blob = self._blob_path(sha256)
+        if os.path.exists(blob):
+            os.remove(apk_path)  # identical content is already stored
+        else:
+            os.replace(apk_path, blob)
+        self.entries[self.key(bundle_id, version)] = {
+            "bundle_id": bundle_id,
+            "version": version,
+            "sha256": sha256,
+            "size": os.path.getsize(blob),
+            "last_used": time.time(),
+        }
+        self.evict(keep=sha256)
+        self._save_index()
+        return blob
+
+    def evict(self, keep=None):
+        """Drop least recently used builds until the cache fits into max_size"""
+        blobs = {}
+        for key, entry in self.entries.items():
+            blob = blobs.setdefault(entry["sha256"], {"size": entry["size"], "last_used": 0, "keys": []})
+            blob["last_used"] = max(blob["last_used"], entry["last_used"])
+            blob["keys"].append(key)
+
+        total = sum(blob["size"] for blob in blobs.values())
+        for sha256, blob in sorted(blobs.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_size:
+                break
+            if sha256 == keep:
+                continue
+            path = self._blob_path(sha256)
+            if os.path.exists(path):
+                os.remove(path)
+            for key in blob["keys"]:
+                del self.entries[key]
+            total -= blob["size"]
+            print(f"Evicted cached APK {', '.join(blob['keys'])}")
+
+    def _blob_path(self, sha256):
+        return os.path.join(self.folder, f"{sha256}.apk")
+
+    def _load_index(self):
+        return load_json(self.index_path)
+
+    def _save_index(self):
+        save_json(self.index_path, self.entries, indent=2)
@@ -1,16 +1,21 @@
+import hashlib
 import os
+import time
+import subprocess
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from adb_module import *
+from apk_cache import ApkCache
+from metadata_cache import conditional_get_json
+from appcenter_client import api_get, get_client
 from decouple import config
 import argparse
 
-
-def check_internet_connection():
-    try:
-        requests.get("https://google.com", timeout=3)
-        return True
-    except requests.ConnectionError:
-        return False
+DEFAULT_INSTALL_WORKERS = 8
+DEFAULT_DEVICE_TIMEOUT = 300  # seconds, version check + (uninstall) + install on one device
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # bytes written per chunk
+DOWNLOAD_RETRIES = 5  # resume attempts after a dropped connection
+DOWNLOAD_TIMEOUT = 30  # seconds without data before the connection is considered dropped
 
 
 # TODO: Add ability to grab a list of downloaded apps, select one from the list and install
@@ -18,18 +23,17 @@ def check_internet_connection():
 def get_latest_download_url(app_identifier='mwl'):
     api_url_key = f"APPCENTER_{app_identifier.upper()}_URL"
     app_url = config(api_url_key)
-    api_token = config("APPCENTER_TOKEN")
-
-    headers = {"X-API-Token": api_token}
-    response = requests.get(app_url, headers=headers)
+    data, changed = conditional_get_json(app_url, get=api_get)
 
-    if response.status_code == 200:
-        data = response.json()
+    if data is not None:
+        if not changed:
+            print("Release metadata unchanged since last run (304)")
         download_url = data["download_url"]
         package_name = data["bundle_identifier"]
         app_version = data["short_version"] + '_' + data["version"]
         release_notes = data["release_notes"]
-        return download_url, package_name, app_version, release_notes
+        # size and fingerprint (MD5) of the build, used to verify the download
+        return download_url, package_name, app_version, release_notes, data.get("size"), data.get("fingerprint")
     else:
         raise Exception("Failed to retrieve download URL from AppCenter.")
 
@@ -38,18 +42,104 @@ def download_and_store_app(
         app_identifier,
         download_url,
         output_folder,
-        app_version):
+        app_version,
+        expected_size=None,
+        md5=None):
     """Function is downloading the Android latest app using Appcenter API
      note: in case app is needed by bundle_number, other API endpoint should be used"""
-    response = requests.get(download_url)
-    if response.status_code == 200:
-        apk_filename = os.path.join(
-            output_folder, f"{app_identifier}_{app_version}.apk")
-        with open(apk_filename, "wb") as apk_file:
-            apk_file.write(response.content)
-        return apk_filename
-    else:
-        raise Exception("Failed to download the app.")
+    apk_filename = os.path.join(
+        output_folder, f"{app_identifier}_{app_version}.apk")
+    return stream_download(download_url, apk_filename, expected_size=expected_size, md5=md5)
+
+
+def stream_download(url, destination, chunk_size=DOWNLOAD_CHUNK_SIZE, retries=DOWNLOAD_RETRIES,
+                    expected_size=None, md5=None):
+    """Download url into destination chunk by chunk.
+     Data goes to '<destination>.part' first and is renamed only when complete,
+     after a dropped connection the download resumes with an HTTP Range request.
+     With expected_size / md5 (from the release metadata) the file is checked before the
+     rename, a mismatch removes the part file and raises"""
+    part_path = destination + ".part"
+    attempt = 0
+
+    while True:
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if expected_size and offset > expected_size:
+            os.remove(part_path)  # left over from a different build
+            offset = 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            with get_client().session.get(url, headers=headers, stream=True,
+                                          timeout=DOWNLOAD_TIMEOUT) as response:
+                if response.status_code == 416 and offset:
+                    # Server has nothing past offset: the part file is already complete
+                    break
+                if response.status_code not in (200, 206):
+                    raise Exception("Failed to download the app.")
+                if response.status_code == 200:
+                    offset = 0  # server ignored Range, start over
+                total = _expected_size(response, offset) or expected_size
+                _write_chunks(response, part_path, offset, total, chunk_size)
+            if total is None or os.path.getsize(part_path) >= total:
+                break
+            raise requests.ConnectionError("Connection closed before download completed")
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            attempt += 1
+            if attempt > retries:
+                raise Exception(f"Failed to download the app: {e}")
+            print(f"\nDownload interrupted ({e}), resuming... [{attempt}/{retries}]")
+            time.sleep(min(2 ** attempt, 30))
+
+    _verify_download(part_path, expected_size, md5)
+    os.replace(part_path, destination)
+    return destination
+
+
+def _verify_download(path, expected_size, md5):
+    problem = None
+    size = os.path.getsize(path)
+    if expected_size and size != expected_size:
+        problem = f"{size} bytes instead of {expected_size}"
+    elif md5 and _file_md5(path) != md5.lower():
+        problem = "MD5 does not match the release fingerprint"
+    if problem:
+        os.remove(path)
+        raise Exception(f"Downloaded app is corrupt: {problem}")
+
+
+def _file_md5(path):
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _expected_size(response, offset):
+    length = response.headers.get("Content-Length")
+    return offset + int(length) if length is not None else None
+
+
+def _write_chunks(response, part_path, offset, total, chunk_size):
+    mode = "ab" if offset else "wb"
+    received = offset
+    started = time.monotonic()
+    with open(part_path, mode) as apk_file:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if not chunk:
+                continue
+            apk_file.write(chunk)
+            received += len(chunk)
+            _print_progress(received, total, received - offset, time.monotonic() - started)
+    print()
+
+
+def _print_progress(received, total, transferred, elapsed):
+    speed = transferred / elapsed / (1024 * 1024) if elapsed > 0 else 0.0
+    done = f"{received / (1024 * 1024):.1f} MB"
+    if total:
+        done += f" / {total / (1024 * 1024):.1f} MB ({received * 100 // total}%)"
+    print(f"\rDownloading: {done} at {speed:.2f} MB/s", end="", flush=True)
 
 
 def get_app_info(package_name, app_version, release_notes):
@@ -60,6 +150,133 @@ def get_app_info(package_name, app_version, release_notes):
     )
 
 
+def version_code_of(app_version):
+    """AppCenter 'version' (the Android versionCode) from '<short_version>_<version>'"""
+    version = app_version.rsplit("_", 1)[-1]
+    return int(version) if version.isdigit() else None
+
+
+def install_on_device(apk_path, package_name, device_id, timeout=DEFAULT_DEVICE_TIMEOUT, streamed=False,
+                      version_code=None, reinstall=False):
+    """Bring a single device to the given build within one timeout budget.
+     Unless reinstall is set the installed versionCode decides: equal -> skipped,
+     older -> in-place upgrade (install -r), newer -> uninstall + install.
+     Returns a dict with device, status, elapsed seconds, a short message and stage timings"""
+    return _install_device(lambda: apk_path, package_name, device_id, timeout, streamed, version_code, reinstall)
+
+
+def install_on_all_devices(apk_path, package_name, devices,
+                           max_workers=DEFAULT_INSTALL_WORKERS, timeout=DEFAULT_DEVICE_TIMEOUT,
+                           streamed=False, version_code=None, reinstall=False):
+    """Fan the install out over all devices using a bounded worker pool.
+     Results are returned in the same order as devices"""
+    return _fan_out(lambda: apk_path, package_name, devices, max_workers, timeout,
+                    streamed, version_code, reinstall)
+
+
+def run_install_pipeline(fetch_apk, package_name, max_workers=DEFAULT_INSTALL_WORKERS,
+                         timeout=DEFAULT_DEVICE_TIMEOUT, streamed=False, version_code=None, reinstall=False):
+    """Download and device preparation overlap: fetch_apk() runs in the background while
+     devices are discovered and checked (and uninstalled where needed); every device installs
+     as soon as fetch_apk has returned the complete, verified APK"""
+    with ThreadPoolExecutor(max_workers=1) as downloader:
+        started = time.monotonic()
+        apk_future = downloader.submit(fetch_apk)
+        apk_future.add_done_callback(
+            lambda f: print_stage("download failed" if f.exception() else "download", started))
+
+        discovery_started = time.monotonic()
+        devices = get_connected_adb_devices()
+        print_stage("device discovery", discovery_started)
+        return _fan_out(apk_future.result, package_name, devices, max_workers, timeout,
+                        streamed, version_code, reinstall)
+
+
+def print_stage(stage, started):
+    print(f"\n[{stage}] {time.monotonic() - started:.1f}s")
+
+
+def _fan_out(get_apk, package_name, devices, max_workers, timeout, streamed, version_code, reinstall):
+    if not devices:
+        return []
+    workers = max(1, min(max_workers, len(devices)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_install_device, get_apk, package_name, device_id, timeout, streamed,
+                                   version_code, reinstall)
+                   for device_id in devices]
+        return [future.result() for future in futures]
+
+
+def _install_device(get_apk, package_name, device_id, timeout, streamed, version_code, reinstall):
+    """Prepare the device, wait for get_apk() and install. Time spent waiting for the APK
+     does not count against timeout"""
+    started = time.monotonic()
+    timings = {}
+    status, message = "FAILED", ""
+    try:
+        action, installed = _prepare_device(package_name, device_id, version_code, reinstall, timeout)
+        timings["prepare"] = time.monotonic() - started
+        if action == "skip":
+            status, message = "SKIPPED", f"versionCode {installed} already installed"
+        else:
+            waited = time.monotonic()
+            apk_path = get_apk()
+            timings["wait"] = time.monotonic() - waited
+            # waiting for the APK is not counted, the install gets what prepare left over
+            remaining = time_left(time.monotonic() + timeout - timings["prepare"], "install")
+            installing = time.monotonic()
+            if action == "upgrade":
+                if upgrade_app(apk_path, package_name, device_id, timeout=remaining, streamed=streamed):
+                    status, message = "OK", f"upgraded from versionCode {installed}"
+                else:
+                    message = "upgrade failed"
+            elif install_app(apk_path, device_id, timeout=remaining, streamed=streamed):
+                status, message = "OK", "installed"
+            else:
+                message = "install failed"
+            timings["install"] = time.monotonic() - installing
+    except subprocess.TimeoutExpired:
+        status, message = "TIMEOUT", f"exceeded {timeout}s"
+    except Exception as e:
+        message = str(e)
+    return {
+        "device": device_id,
+        "status": status,
+        "elapsed": time.monotonic() - started,
+        "message": message,
+        "timings": timings,
+    }
+
+
+def _prepare_device(package_name, device_id, version_code, reinstall, timeout):
+    """Version check plus any uninstall that must happen before the install.
+     Returns (action, installed versionCode) with action 'skip', 'upgrade' or 'install'"""
+    deadline = time.monotonic() + timeout
+    installed = None if reinstall else get_installed_version_code(package_name, device_id, timeout=timeout)
+    if installed is not None and version_code is not None and installed == version_code:
+        return "skip", installed
+    if installed is not None and (version_code is None or installed < version_code):
+        return "upgrade", installed
+    if installed is not None or reinstall:
+        uninstall_app(package_name, device_id, timeout=time_left(deadline, "uninstall"))
+    return "install", installed
+
+
+def print_install_summary(results):
+    if not results:
+        print("No connected devices found.")
+        return
+    width = max(len("Device"), *(len(r["device"]) for r in results))
+    print(f"\n{'Device':<{width}}  {'Status':<7}  {'Time':>7}  Details")
+    print(f"{'-' * width}  {'-' * 7}  {'-' * 7}  {'-' * 20}")
+    for r in results:
+        stages = ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in r.get("timings", {}).items())
+        details = f"{r['message']} ({stages})" if stages else r["message"]
+        print(f"{r['device']:<{width}}  {r['status']:<7}  {r['elapsed']:>6.1f}s  {details}")
+    ok = sum(1 for r in results if r["status"] in ("OK", "SKIPPED"))
+    print(f"\n{ok}/{len(results)} devices up to date")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Install app using AppCenter API.")
@@ -67,33 +284,63 @@ def main():
         "--ml",
         action="store_true",
         help="Use --ml to install ML! app, --mwl is default parameter")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_INSTALL_WORKERS,
+        help="Max number of devices installed in parallel")
+    parser.add_argument(
+        "--timeout",
+        type=int,
+        default=DEFAULT_DEVICE_TIMEOUT,
+        help="Per-device timeout in seconds for version check + install")
+    parser.add_argument(
+        "--streamed",
+        action="store_true",
+        help="Stream the APK into a package manager session instead of pushing it first")
+    parser.add_argument(
+        "--reinstall",
+        action="store_true",
+        help="Always uninstall + install instead of skipping or upgrading in place")
 
     args = parser.parse_args()
 
-    internet_connected = check_internet_connection()
-    if not internet_connected:
-        print("No internet connection.")
+    if args.ml:
+        app_identifier = 'ml'
     else:
-        if args.ml:
-            app_identifier = 'ml'
-        else:
-            app_identifier = 'mwl'
+        app_identifier = 'mwl'
 
-        download_url, package_name, app_version, release_notes = get_latest_download_url(
+    # The metadata request doubles as the connectivity check
+    started = time.monotonic()
+    try:
+        download_url, package_name, app_version, release_notes, size, fingerprint = get_latest_download_url(
             app_identifier)
+    except requests.ConnectionError:
+        print("No internet connection.")
+    else:
+        print_stage("metadata", started)
         app_info = get_app_info(package_name, app_version, release_notes)
         print(f"{app_info}\n")
         output_folder = os.path.join(os.getcwd(), "downloads")
         os.makedirs(output_folder, exist_ok=True)
 
-        apk_path = download_and_store_app(
-            app_identifier, download_url, output_folder, app_version)
-        connected_devices = get_connected_adb_devices()
+        apk_cache = ApkCache(output_folder)
+
+        def fetch_apk():
+            apk_path = apk_cache.get(package_name, app_version)
+            if apk_path:
+                print(f"Using cached APK {apk_path}")
+                return apk_path
+            downloaded_path = download_and_store_app(
+                app_identifier, download_url, output_folder, app_version, size, fingerprint)
+            return apk_cache.add(package_name, app_version, downloaded_path)
 
-        for device_id in connected_devices:
-            uninstall_app(package_name, device_id)
-            install_app(apk_path, device_id)
-            print(f"App was installed on device '{device_id}'")
+        started = time.monotonic()
+        results = run_install_pipeline(
+            fetch_apk, package_name, args.workers, args.timeout, args.streamed,
+            version_code_of(app_version), args.reinstall)
+        print_stage("total", started)
+        print_install_summary(results)
 
 
 if __name__ == "__main__":
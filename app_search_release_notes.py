@@ -1,17 +1,24 @@
-import requests
+import argparse
+import json
 from decouple import config
+from appcenter_client import get_client
+from release_store import ReleaseStore
 from pprint import pprint
 from termcolor import *
 
-while True:
-    try:
-        LIM = int(input("Limit the number of recent releases by: "))
-        if LIM > 0:
-            break  # Exit the loop if input is a positive integer
-        else:
-            print("Should be a positive integer greater than zero")
-    except ValueError:
-        print("Invalid input. Please enter a valid integer")
+LIM = None  # number of recent releases to search, asked for in interactive mode
+
+
+def ask_limit():
+    while True:
+        try:
+            limit = int(input("Limit the number of recent releases by: "))
+            if limit > 0:
+                return limit  # Exit the loop if input is a positive integer
+            else:
+                print("Should be a positive integer greater than zero")
+        except ValueError:
+            print("Invalid input. Please enter a valid integer")
 
 
 def print_debug(message):
@@ -19,38 +26,24 @@ def print_debug(message):
         print(message)
 
 
-def get_release_ids(OWNER_NAME, APP_NAME, limit=LIM):
+def get_release_ids(OWNER_NAME, APP_NAME, limit=None):
     print_debug("Calling get_release_ids")
-    app_url = f"https://api.appcenter.ms/v0.1/apps/{OWNER_NAME}/{APP_NAME}/releases"
-    api_token = config("APPCENTER_TOKEN")
-    headers = {"X-API-Token": api_token}
-
-    response = requests.get(app_url, headers=headers)
-
-    if response.status_code == 200:
-        data = response.json()
-        release_ids = [release["id"] for release in data[:limit]
-                       ] if limit else [release["id"] for release in data]
-        print(f"{release_ids} total: {len(release_ids)}\n")
-        return release_ids
-    else:
-        print(
-            f"Failed to retrieve release IDs from AppCenter. Status Code: {
-            response.status_code}")
-        print(f"Response Content: {response.content}")
-        raise Exception("Failed to retrieve release IDs from AppCenter.")
-
-
-def get_release_notes(OWNER_NAME, APP_NAME, release_ids):
-    release_notes_dict = {}
+    release_ids = [release["id"]
+                   for release in get_client().iter_releases(OWNER_NAME, APP_NAME, limit=limit)]
+    print(f"{release_ids} total: {len(release_ids)}\n")
+    return release_ids
 
-    for release_id in release_ids:
-        app_url = f"https://api.appcenter.ms/v0.1/apps/{OWNER_NAME}/{APP_NAME}/releases/{release_id}"
-        api_token = config("APPCENTER_TOKEN")
-        headers = {"X-API-Token": api_token}
 
-        response = requests.get(app_url, headers=headers)
+def get_release_notes(OWNER_NAME, APP_NAME, release_ids, max_workers=None):
+    """Fetches release details concurrently (max_workers, default APPCENTER_CONCURRENCY),
+     the result keeps the order of release_ids"""
+    release_notes_dict = {}
+    client = get_client()
+    urls = [client.app_url(OWNER_NAME, APP_NAME, "releases", release_id)
+            for release_id in release_ids]
+    responses = client.get_many(urls, max_workers=max_workers)
 
+    for release_id, response in zip(release_ids, responses):
         if response.status_code == 200:
             data = response.json()
             if "release_notes" in data:
@@ -68,11 +61,19 @@ def get_release_notes(OWNER_NAME, APP_NAME, release_ids):
     return release_notes_dict
 
 
-def search_releases_by_partial_notes(OWNER_NAME, APP_NAME, partial_notes):
+def search_releases_by_partial_notes(OWNER_NAME, APP_NAME, partial_notes, store=None, offline=False,
+                                     limit=None):
     print_debug("Calling search_releases_by_partial_notes")
+    limit = limit or LIM
+    if store is not None:
+        if not offline:
+            store.sync(OWNER_NAME, APP_NAME, limit=limit)
+        found = store.search(OWNER_NAME, APP_NAME, partial_notes, limit=limit)
+        return {release_id: info["release_notes"] for release_id, info in found.items()}
+
     matching_releases = {}
 
-    release_ids = get_release_ids(OWNER_NAME, APP_NAME, limit=LIM)
+    release_ids = get_release_ids(OWNER_NAME, APP_NAME, limit=limit)
     release_notes_dict = get_release_notes(OWNER_NAME, APP_NAME, release_ids)
 
     for release_id, release_notes in release_notes_dict.items():
@@ -83,13 +84,50 @@ def search_releases_by_partial_notes(OWNER_NAME, APP_NAME, partial_notes):
     return matching_releases
 
 
+def read_queries(queries, queries_file):
+    queries = list(queries)
+    if queries_file:
+        with open(queries_file, encoding="utf-8") as f:
+            queries.extend(line.strip() for line in f if line.strip())
+    return queries
+
+
+def run_batch(OWNER_NAME, APP_NAME, queries, limit, store, offline=False):
+    """Sync once, evaluate all queries in one pass and print one JSON line per query"""
+    if not offline:
+        store.sync(OWNER_NAME, APP_NAME, limit=limit)
+    results = store.search_many(OWNER_NAME, APP_NAME, queries, limit=limit)
+    for query in queries:
+        matches = [{"release_id": release_id, "release_notes": info["release_notes"]}
+                   for release_id, info in results[query].items()]
+        print(json.dumps({"query": query, "matches": matches}))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Search AppCenter release notes. Without queries the search is interactive.")
+    parser.add_argument("queries", nargs="*",
+                        help="Search strings (case insensitive), results are printed as JSON lines")
+    parser.add_argument("--file", help="File with one search string per line")
+    parser.add_argument("--limit", type=int, help="Limit the number of recent releases")
+    parser.add_argument("--offline", action="store_true", help="Search the local store without syncing")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
     OWNER_NAME = config("OWNER_NAME")
     APP_NAME = config("APP_NAME")
+    args = parse_args()
+    queries = read_queries(args.queries, args.file)
+    if queries:
+        run_batch(OWNER_NAME, APP_NAME, queries, args.limit, ReleaseStore(), args.offline)
+        raise SystemExit(0)
+
+    LIM = args.limit or ask_limit()
     partial_notes = str(
         input("Search for string (case insensitive): ")).lower()
     matching_releases = search_releases_by_partial_notes(
-        OWNER_NAME, APP_NAME, partial_notes)
+        OWNER_NAME, APP_NAME, partial_notes, store=ReleaseStore(), offline=args.offline)
 
     for release_id, release_notes_list in matching_releases.items():
         print(colored(f"Release ID: {release_id}", "blue"))
@@ -1,41 +1,32 @@
-import requests
+import argparse
+import json
 from decouple import config
+from appcenter_client import api_get, get_client
+from release_store import ReleaseStore
 from termcolor import colored
 
 
 def make_api_request(endpoint):
-    api_token = config("APPCENTER_TOKEN")
-    headers = {"X-API-Token": api_token}
-    response = requests.get(endpoint, headers=headers)
-    return response
+    return api_get(endpoint)
 
 
 def get_release_ids(OWNER_NAME, APP_NAME, limit):
     print_debug("Calling get_release_ids")
-    endpoint = f"{config('API_BASE_URL')}/{OWNER_NAME}/{APP_NAME}/releases"
-    response = make_api_request(endpoint)
-
-    if response.status_code == 200:
-        data = response.json()
-        releases = data[:limit] if limit else data
-        release_ids = [release["id"] for release in releases]
-        print(f"{release_ids} total: {len(release_ids)}\n")
-        return release_ids
-    else:
-        print(
-            f"Failed to retrieve release IDs from AppCenter. Status Code: {
-            response.status_code}")
-        print(f"Response Content: {response.content}")
-        raise Exception("Failed to retrieve release IDs from AppCenter.")
+    release_ids = [release["id"]
+                   for release in get_client().iter_releases(OWNER_NAME, APP_NAME, limit=limit)]
+    print(f"{release_ids} total: {len(release_ids)}\n")
+    return release_ids
 
 
-def get_release_notes(OWNER_NAME, APP_NAME, release_ids):
+def get_release_notes(OWNER_NAME, APP_NAME, release_ids, max_workers=None):
+    """Fetches release details concurrently (max_workers, default APPCENTER_CONCURRENCY),
+     the result keeps the order of release_ids"""
     release_notes_dict = {}
+    endpoints = [f"{config('API_BASE_URL')}/{OWNER_NAME}/{APP_NAME}/releases/{release_id}"
+                 for release_id in release_ids]
+    responses = get_client().get_many(endpoints, max_workers=max_workers)
 
-    for release_id in release_ids:
-        endpoint = f"{
-        config('API_BASE_URL')}/{OWNER_NAME}/{APP_NAME}/releases/{release_id}"
-        response = make_api_request(endpoint)
+    for release_id, response in zip(release_ids, responses):
         if response.status_code == 200:
             data = response.json()
             if "release_notes" in data:
@@ -58,7 +49,21 @@ def get_release_notes(OWNER_NAME, APP_NAME, release_ids):
 
 
 def search_releases_by_partial_notes(
-        OWNER_NAME, APP_NAME, partial_notes, limit):
+        OWNER_NAME, APP_NAME, partial_notes, limit, store=None, offline=False,
+        full_text=False, min_version=None, max_version=None):
+    """With a ReleaseStore only releases missing locally are fetched (none when offline)
+     and the search itself runs against the store.
+     full_text=True uses the store's full-text index (terms ANDed, "phrase", prefix*)
+     instead of the substring match"""
+    if store is not None:
+        if not offline:
+            added = store.sync(OWNER_NAME, APP_NAME, limit=limit)
+            print_debug(f"Synced {added} new releases into {store.path}")
+        if full_text:
+            return store.full_text_search(OWNER_NAME, APP_NAME, partial_notes,
+                                          min_version=min_version, max_version=max_version)
+        return store.search(OWNER_NAME, APP_NAME, partial_notes, limit=limit)
+
     release_ids = get_release_ids(OWNER_NAME, APP_NAME, limit=limit)
     release_notes_dict = get_release_notes(OWNER_NAME, APP_NAME, release_ids)
 
@@ -84,10 +89,56 @@ def print_debug(message):
         print(message)
 
 
+def read_queries(queries, queries_file):
+    queries = list(queries)
+    if queries_file:
+        with open(queries_file, encoding="utf-8") as f:
+            queries.extend(line.strip() for line in f if line.strip())
+    return queries
+
+
+def run_batch(OWNER_NAME, APP_NAME, queries, limit, store, offline=False,
+              full_text=False, min_version=None, max_version=None):
+    """Sync once, evaluate all queries against the store and print one JSON line per query"""
+    if not offline:
+        store.sync(OWNER_NAME, APP_NAME, limit=limit)
+    if full_text:
+        results = {query: store.full_text_search(OWNER_NAME, APP_NAME, query,
+                                                 min_version=min_version, max_version=max_version)
+                   for query in queries}
+    else:
+        results = store.search_many(OWNER_NAME, APP_NAME, queries, limit=limit)
+    for query in queries:
+        matches = [{"release_id": release_id, **info} for release_id, info in results[query].items()]
+        print(json.dumps({"query": query, "matches": matches}))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Search AppCenter release notes. Without queries the search is interactive.")
+    parser.add_argument("queries", nargs="*",
+                        help="Search strings (case insensitive), results are printed as JSON lines")
+    parser.add_argument("--file", help="File with one search string per line")
+    parser.add_argument("--limit", type=int, help="Limit the number of recent releases")
+    parser.add_argument("--offline", action="store_true", help="Search the local store without syncing")
+    parser.add_argument("--full-text", action="store_true",
+                        help="Use the full-text index: all terms must match, \"phrase\", prefix*")
+    parser.add_argument("--min-version", help="Lowest short version to report (full-text only)")
+    parser.add_argument("--max-version", help="Highest short version to report (full-text only)")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
     OWNER_NAME = config("OWNER_NAME")
     APP_NAME = config("APP_NAME")
-    limit = int(input("Limit the number of recent releases by: "))
+    args = parse_args()
+    queries = read_queries(args.queries, args.file)
+    if queries:
+        run_batch(OWNER_NAME, APP_NAME, queries, args.limit, ReleaseStore(), args.offline,
+                  args.full_text, args.min_version, args.max_version)
+        raise SystemExit(0)
+
+    limit = args.limit or int(input("Limit the number of recent releases by: "))
     partial_notes = str(
         input("Search for string (case insensitive): ")).lower()
 
@@ -96,7 +147,8 @@ if __name__ == "__main__":
         limit = int(input("Limit the number of recent releases by: "))
 
     matching_releases = search_releases_by_partial_notes(
-        OWNER_NAME, APP_NAME, partial_notes, limit)
+        OWNER_NAME, APP_NAME, partial_notes, limit, store=ReleaseStore(), offline=args.offline,
+        full_text=args.full_text, min_version=args.min_version, max_version=args.max_version)
 
     for release_id, release_info in matching_releases.items():
         print(colored(f"Release ID: {release_id}", "blue"))
@@ -0,0 +1,171 @@
+import codecs
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from decouple import config
+
+DEFAULT_API_BASE_URL = "https://api.appcenter.ms/v0.1/apps"
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RETRIES = 5
+DEFAULT_CONNECT_RETRIES = 1  # a failed connect means no network more often than not, report it quickly
+DEFAULT_BACKOFF = 0.5  # seconds, doubled on every retry
+RETRY_STATUSES = (500, 502, 503, 504)  # 429 is handled by api_get for all threads at once
+REQUEST_TIMEOUT = 30  # seconds
+STREAM_CHUNK_SIZE = 16 * 1024  # bytes read at a time when parsing listings
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class _ServerErrorRetry(Retry):
+    """urllib3 retries a 429 carrying Retry-After on its own, per request and thread.
+     Leave 429 to api_get so the pause applies to every caller of the client"""
+    RETRY_AFTER_STATUS_CODES = Retry.RETRY_AFTER_STATUS_CODES - {429}
+
+
+class AppCenterClient:
+    """Keep-alive HTTP session shared by all AppCenter callers.
+     The token is read once; it is only sent to the AppCenter API (api_get),
+     plain downloads through the same session do not carry it.
+     A 429 answer pauses every api_get call of the client until Retry-After has passed"""
+
+    def __init__(self, api_token=None, base_url=None, pool_size=None,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+        if api_token is None:
+            api_token = config("APPCENTER_TOKEN")
+        if base_url is None:
+            base_url = config("API_BASE_URL", default=DEFAULT_API_BASE_URL)
+        if pool_size is None:
+            pool_size = config("APPCENTER_POOL_SIZE", default=DEFAULT_POOL_SIZE, cast=int)
+
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        self._resume_at = 0.0
+        self._throttle_lock = threading.Lock()
+        self.headers = {"X-API-Token": api_token, "Accept": "application/json"}
+
+        retry = _ServerErrorRetry(
+            total=retries,
+            connect=min(retries, DEFAULT_CONNECT_RETRIES),
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def app_url(self, owner_name, app_name, *path):
+        return "/".join([self.base_url, owner_name, app_name, *(str(p) for p in path)])
+
+    def api_get(self, url, headers=None, **kwargs):
+        """GET an AppCenter API url with the token headers attached"""
+        request_headers = dict(self.headers)
+        if headers:
+            request_headers.update(headers)
+        kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+
+        attempt = 0
+        while True:
+            self._wait_for_rate_limit()
+            response = self.session.get(url, headers=request_headers, **kwargs)
+            if response.status_code != 429 or attempt >= self.retries:
+                return response
+            attempt += 1
+            self._throttle(response, attempt)
+
+    def get_many(self, urls, max_workers=None):
+        """api_get every url concurrently, responses come back in the order of urls"""
+        urls = list(urls)
+        if max_workers is None:
+            max_workers = config("APPCENTER_CONCURRENCY", default=DEFAULT_CONCURRENCY, cast=int)
+        max_workers = max(1, min(max_workers, self.pool_size, len(urls) or 1))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(self.api_get, urls))
+
+    def iter_releases(self, owner_name, app_name, limit=None):
+        """Yield release summaries newest first, parsing the listing while it downloads.
+         The server is asked for at most limit items (top) and the connection is dropped
+         as soon as limit items were produced"""
+        params = {"top": limit} if limit else None
+        with self.api_get(self.app_url(owner_name, app_name, "releases"),
+                          params=params, stream=True) as response:
+            if response.status_code != 200:
+                raise Exception(f"Failed to retrieve release IDs from AppCenter. "
+                                f"Status Code: {response.status_code}")
+            for count, release in enumerate(iter_json_array(response), start=1):
+                yield release
+                if limit and count >= limit:
+                    return
+
+    def _wait_for_rate_limit(self):
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _throttle(self, response, attempt):
+        try:
+            delay = float(response.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            delay = self.backoff * (2 ** attempt)
+        with self._throttle_lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+
+def iter_json_array(response, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield the items of a top-level JSON array from a streamed response one at a time"""
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")()
+    buffer = ""
+    pos = 0
+    started = False
+
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        buffer = buffer[pos:] + text_decoder.decode(chunk)
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # item is not complete yet, read more
+            yield item
+            pos = end
+
+    if buffer[pos:].strip():
+        raise ValueError("Truncated JSON array")
+
+
+def get_client():
+    """Return the process-wide AppCenterClient, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = AppCenterClient()
+    return _client
+
+
+def api_get(url, **kwargs):
+    return get_client().api_get(url, **kwargs)
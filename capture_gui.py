@@ -4,8 +4,12 @@ import threading
 import logging
 import os
 
+import adb_client
 import android_capture
+import device_registry
 import ios_capture  # stub file, same API as android_capture for now
+import screen_capture
+import screenshots
 
 
 # TODO add UI to clear the LOG window
@@ -38,9 +42,16 @@ class CaptureApp(tk.Tk):
         self.geometry("720x600")
 
         self.stop_event = threading.Event()
+        self.repro_buffer = None  # screen_capture.RingRecorder while the buffer runs
+        self.device_ids = []  # rows of the device list
+        self.devices = {}  # id -> registry entry of the devices shown, in connection order
 
         self._build_ui()
         self._setup_logging()
+        # the list fills from the registry's events, opening the window never waits for adb
+        registry = device_registry.get_registry()
+        registry.subscribe(self._on_device_event)
+        registry.start()
 
     def _build_ui(self):
         # --- Capture mode ---
@@ -51,6 +62,25 @@ class CaptureApp(tk.Tk):
         tk.Radiobutton(mode_frame, text="Recording", variable=self.capture_mode, value="rec").pack(side="left", padx=10)
         tk.Radiobutton(mode_frame, text="Screenshot", variable=self.capture_mode, value="scr").pack(side="left",
                                                                                                     padx=10)
+        tk.Radiobutton(mode_frame, text="Burst", variable=self.capture_mode, value="burst").pack(side="left",
+                                                                                              padx=10)
+        self.stream_recording = tk.BooleanVar(value=False)
+        tk.Checkbutton(mode_frame, text="Stream to PC (no device storage)",
+                       variable=self.stream_recording).pack(side="left", padx=10)
+
+        # --- Burst: shots per second and length, unchanged frames are dropped ---
+        burst_frame = tk.LabelFrame(self, text="Burst", padx=5, pady=5)
+        burst_frame.pack(fill="x", padx=10, pady=5)
+
+        tk.Label(burst_frame, text="Shots/s").pack(side="left")
+        self.burst_rate_entry = tk.Entry(burst_frame, width=6)
+        self.burst_rate_entry.insert(0, str(screenshots.DEFAULT_BURST_RATE))
+        self.burst_rate_entry.pack(side="left", padx=5)
+
+        tk.Label(burst_frame, text="Seconds").pack(side="left")
+        self.burst_duration_entry = tk.Entry(burst_frame, width=6)
+        self.burst_duration_entry.insert(0, str(screenshots.DEFAULT_BURST_DURATION))
+        self.burst_duration_entry.pack(side="left", padx=5)
 
         # --- Jira ticket ---
         jira_frame = tk.LabelFrame(self, text="Jira ticket", padx=5, pady=5)
@@ -77,6 +107,14 @@ class CaptureApp(tk.Tk):
         tk.Radiobutton(platform_frame, text="Android", variable=self.platform, value="AND").pack(side="left", padx=10)
         tk.Radiobutton(platform_frame, text="iOS", variable=self.platform, value="iOS").pack(side="left", padx=10)
 
+        # --- Android devices: none selected = first device, several = captured together ---
+        device_frame = tk.LabelFrame(self, text="Android devices", padx=5, pady=5)
+        device_frame.pack(fill="x", padx=10, pady=5)
+
+        self.device_list = tk.Listbox(device_frame, selectmode=tk.MULTIPLE, height=3, exportselection=False)
+        self.device_list.pack(side="left", fill="x", expand=True)
+        tk.Button(device_frame, text="Refresh", command=self.refresh_devices).pack(side="left", padx=10)
+
         # --- BFF / CAS ---
         bc_frame = tk.LabelFrame(self, text="BFF / CAS", padx=5, pady=5)
         bc_frame.pack(fill="x", padx=10, pady=5)
@@ -97,6 +135,15 @@ class CaptureApp(tk.Tk):
         tk.Button(btn_frame, text="Stop", command=self.stop_capture).pack(side="left", padx=10)
         tk.Button(btn_frame, text="Reset", command=self.reset_fields).pack(side="left", padx=10)
 
+        # --- Repro buffer (Android): keeps the last seconds of screen, saved after the fact ---
+        repro_frame = tk.LabelFrame(self, text=f"Repro buffer (last {screen_capture.REPRO_SECONDS}s)",
+                                    padx=5, pady=5)
+        repro_frame.pack(fill="x", padx=10, pady=5)
+
+        tk.Button(repro_frame, text="Start buffer", command=self.start_buffer).pack(side="left", padx=10)
+        tk.Button(repro_frame, text="Stop buffer", command=self.stop_buffer).pack(side="left", padx=10)
+        tk.Button(repro_frame, text="Save repro", command=self.save_repro).pack(side="left", padx=10)
+
         # --- Log output ---
         log_frame = tk.LabelFrame(self, text="Log Output", padx=5, pady=5)
         log_frame.pack(fill="both", expand=True, padx=10, pady=10)
@@ -117,13 +164,38 @@ class CaptureApp(tk.Tk):
         platform = self.platform.get()
         bff = self.bff_entry.get().strip()
         cas = self.cas_entry.get().strip()
+        stream = self.stream_recording.get()
+        selected = self.selected_devices()
+        try:
+            burst_rate = float(self.burst_rate_entry.get())
+            burst_duration = float(self.burst_duration_entry.get())
+        except ValueError:
+            burst_rate = burst_duration = 0
+        if capture_mode == "burst" and (burst_rate <= 0 or burst_duration <= 0):
+            logging.error("Burst shots/s and seconds must be positive numbers.")
+            return
 
         self.stop_event.clear()
 
         def run_capture():
             try:
-                if platform == "AND":
-                    device_id = android_capture.get_default_device()
+                if platform == "AND" and len(selected) > 1:
+                    android_capture.android_capture_multi(
+                        device_ids=selected,
+                        capture_type=capture_type,
+                        mode=capture_mode,
+                        jira_task=jira,
+                        platf=platform,
+                        dest_folder=DEST_FOLDER,
+                        bff=bff,
+                        cas=cas,
+                        stop_event=self.stop_event,
+                        stream=stream,
+                        burst_rate=burst_rate,
+                        burst_duration=burst_duration,
+                    )
+                elif platform == "AND":
+                    device_id = selected[0] if selected else android_capture.get_default_device()
                     android_capture.android_capture(
                         device_id=device_id,
                         capture_type=capture_type,
@@ -134,6 +206,9 @@ class CaptureApp(tk.Tk):
                         bff=bff,
                         cas=cas,
                         stop_event=self.stop_event,
+                        stream=stream,
+                        burst_rate=burst_rate,
+                        burst_duration=burst_duration,
                     )
                 elif platform == "iOS":
                     ios_capture.ios_capture(
@@ -156,17 +231,102 @@ class CaptureApp(tk.Tk):
         self.stop_event.set()
         logging.info("⏹️ Stop signal sent.")
 
+    def refresh_devices(self):
+        try:
+            devices = device_registry.get_registry().devices()
+        except (OSError, adb_client.AdbError) as e:
+            logging.error(f"Listing Android devices failed: {e}")
+            devices = []
+        self.devices = {dev["id"]: dev for dev in devices}
+        self._show_devices()
+        logging.info(f"{len(devices)} Android device(s) connected.")
+
+    def _show_devices(self):
+        """Rebuild the device list, devices that stay connected keep their selection"""
+        selected = set(self.selected_devices())
+        self.device_ids = list(self.devices)
+        self.device_list.delete(0, tk.END)
+        for index, dev in enumerate(self.devices.values()):
+            self.device_list.insert(tk.END, f"{dev['id']} ({dev['model']})")
+            if dev["id"] in selected:
+                self.device_list.selection_set(index)
+
+    def selected_devices(self):
+        return [self.device_ids[i] for i in self.device_list.curselection() if i < len(self.device_ids)]
+
+    def _on_device_event(self, event, device):
+        # called on the registry's tracking thread, widgets may only be touched from the Tk loop
+        try:
+            self.after(0, self._device_changed, event, device)
+        except (RuntimeError, tk.TclError):
+            pass  # window already closed
+
+    def _device_changed(self, event, device):
+        if event == "removed" or device["state"] != "device":
+            if self.devices.pop(device["id"], None) is None:
+                return
+            logging.info(f"Device {device['id']} disconnected.")
+        else:
+            if device["id"] not in self.devices:
+                logging.info(f"Device {device['id']} connected.")
+            self.devices[device["id"]] = device  # also picks up the model once it is read
+        self._show_devices()
+
+    def start_buffer(self):
+        if self.repro_buffer:
+            logging.info("Repro buffer is already running.")
+            return
+        selected = self.selected_devices()
+        try:
+            device_id = selected[0] if selected else android_capture.get_default_device()
+        except RuntimeError as e:
+            logging.error(str(e))
+            return
+        self.repro_buffer = screen_capture.RingRecorder(device_id).start()
+        logging.info(f"⏺️ Repro buffer running on {device_id}.")
+
+    def stop_buffer(self):
+        if self.repro_buffer:
+            self.repro_buffer.stop()
+            self.repro_buffer = None
+            logging.info("Repro buffer stopped.")
+
+    def save_repro(self):
+        if not self.repro_buffer:
+            logging.error("Start the repro buffer first.")
+            return
+        buffer = self.repro_buffer
+        filename = android_capture.build_filename(
+            "r", self.jira_entry.get().strip(), self.platform.get(),
+            self.bff_entry.get().strip(), self.cas_entry.get().strip(), "rec")
+
+        def run_save():
+            try:
+                seconds = buffer.buffered_seconds()
+                path = buffer.save(os.path.join(DEST_FOLDER, filename))
+                logging.info(f"✅ Repro saved ({seconds:.0f}s): {path}")
+            except Exception as e:
+                logging.error(f"Saving repro failed: {e}")
+
+        threading.Thread(target=run_save, daemon=True).start()
+
     def reset_fields(self):
         self.jira_entry.delete(0, tk.END)
         self.capture_type.set("n")
         self.capture_mode.set("rec")
         self.platform.set("AND")
+        self.burst_rate_entry.delete(0, tk.END)
+        self.burst_rate_entry.insert(0, str(screenshots.DEFAULT_BURST_RATE))
+        self.burst_duration_entry.delete(0, tk.END)
+        self.burst_duration_entry.insert(0, str(screenshots.DEFAULT_BURST_DURATION))
         self.bff_entry.delete(0, tk.END)
         self.cas_entry.delete(0, tk.END)
         logging.info("Form reset.")
 
     def on_close(self):
+        device_registry.get_registry().unsubscribe(self._on_device_event)
         self.stop_event.set()
+        self.stop_buffer()
         self.destroy()
 
 
@@ -0,0 +1,199 @@
+# device_registry.py (connected Android devices, kept current by the adb server)
+#
+# One place to ask "which devices are connected". The registry subscribes to
+# host:track-devices on the adb server, so plug/unplug events arrive as they happen and
+# lookups don't run `adb devices`. Model, ABI and SDK are read once per device and cached;
+# the read runs in the background, a device is listed as soon as its state is known.
+
+import logging
+import re
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import adb_client
+
+READY_TIMEOUT = 5  # seconds to wait for the first device list
+RECONNECT_DELAY = 1  # seconds between attempts to reach the adb server
+PROPERTIES_TIMEOUT = 3  # seconds for the getprop call, a device that doesn't answer stays "unknown"
+PROPERTIES_CMD = "getprop ro.product.model; getprop ro.product.cpu.abi; getprop ro.build.version.sdk"
+
+
+def safe_device_name(device_id: str) -> str:
+    """Serials like 192.168.0.5:5555 made filesystem safe"""
+    return re.sub(r"[^\w.-]", "_", device_id)
+
+
+def parse_device_list(listing: str) -> Dict[str, str]:
+    """'serial<TAB>state' lines -> {serial: state}"""
+    devices = {}
+    for line in listing.splitlines():
+        if "\t" in line:
+            serial, state = line.split("\t", 1)
+            devices[serial.strip()] = state.split()[0] if state.split() else "unknown"
+    return devices
+
+
+class DeviceRegistry:
+    def __init__(self, client: Optional[adb_client.AdbClient] = None):
+        self.client = client or adb_client.get_client()
+        self._devices = {}  # serial -> {"id", "state", "model", "abi", "sdk"}
+        self._properties = {}  # serial -> cached getprop values
+        self._pending = {}  # serial -> Event set when the property read has finished
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._unreachable = threading.Event()
+        self._stop = threading.Event()
+        self._listeners = []
+        self._thread = None
+
+    # === public API ===
+    def start(self):
+        if self._thread is None and adb_client.USE_NATIVE_ADB:
+            self._thread = threading.Thread(target=self._track, name="adb-track-devices", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def subscribe(self, callback: Callable[[str, dict], None]):
+        """callback(event, device) with event 'added', 'removed' or 'changed' (new state, or the
+         model / ABI / SDK were read). Called on the tracking thread"""
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback: Callable[[str, dict], None]):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def devices(self, state: Optional[str] = "device") -> List[dict]:
+        """Known devices in the given state (None for all), in connection order"""
+        self._wait_ready()
+        self._wait_properties()
+        with self._lock:
+            return [dict(dev) for dev in self._devices.values() if state is None or dev["state"] == state]
+
+    def device_ids(self, state: Optional[str] = "device") -> List[str]:
+        return [dev["id"] for dev in self.devices(state)]
+
+    def get(self, serial: str) -> Optional[dict]:
+        self._wait_ready()
+        self._wait_properties()
+        with self._lock:
+            dev = self._devices.get(serial)
+            return dict(dev) if dev else None
+
+    # === internals ===
+    def _wait_ready(self):
+        self.start()
+        if self._thread is None:
+            # native adb disabled: list through the adb executable, properties stay cached
+            self._apply(parse_device_list(adb_client.run(["devices"]).stdout))
+            return
+        deadline = time.monotonic() + READY_TIMEOUT
+        while not self._ready.wait(0.05):
+            if self._unreachable.is_set() or time.monotonic() > deadline:
+                # adb server not running: one listing through the adb executable starts it,
+                # tracking picks up from there
+                self._apply(parse_device_list(adb_client.run(["devices"]).stdout))
+                return
+
+    def _wait_properties(self):
+        """Give property reads in flight up to PROPERTIES_TIMEOUT, so callers rarely see 'unknown'"""
+        deadline = time.monotonic() + PROPERTIES_TIMEOUT
+        with self._lock:
+            pending = list(self._pending.values())
+        for done in pending:
+            if not done.wait(max(0.0, deadline - time.monotonic())):
+                return
+
+    def _track(self):
+        while not self._stop.is_set():
+            try:
+                with self.client.connect() as conn:
+                    conn.send_request("host:track-devices")
+                    while not self._stop.is_set():
+                        listing = conn.read_length_prefixed().decode("utf-8", "replace")
+                        self._apply(parse_device_list(listing))
+            except adb_client.AdbUnavailable as e:
+                self._unreachable.set()
+                logging.debug(f"Device tracking interrupted: {e}")
+            except (adb_client.AdbError, OSError) as e:
+                logging.debug(f"Device tracking interrupted: {e}")
+            self._stop.wait(RECONNECT_DELAY)
+
+    def _apply(self, states: Dict[str, str]):
+        events = []
+        with self._lock:
+            for serial in list(self._devices):
+                if serial not in states:
+                    events.append(("removed", self._devices.pop(serial)))
+                    self._properties.pop(serial, None)
+
+            for serial, state in states.items():
+                previous = self._devices.get(serial)
+                if previous and previous["state"] == state:
+                    continue
+                dev = {"id": serial, "state": state, "model": "unknown", "abi": "", "sdk": ""}
+                if state == "device":
+                    if serial in self._properties:
+                        dev.update(self._properties[serial])
+                    elif serial not in self._pending:
+                        done = self._pending[serial] = threading.Event()
+                        threading.Thread(target=self._fill_properties, args=(serial, done),
+                                         name=f"adb-getprop-{serial}", daemon=True).start()
+                self._devices[serial] = dev
+                events.append(("changed" if previous else "added", dict(dev)))
+
+        self._ready.set()
+        self._notify(events)
+
+    def _notify(self, events):
+        for event, dev in events:
+            for callback in list(self._listeners):
+                try:
+                    callback(event, dev)
+                except Exception as e:
+                    logging.error(f"Device listener failed: {e}")
+
+    def _fill_properties(self, serial: str, done: threading.Event):
+        props = self._read_properties(serial)
+        changed = None
+        with self._lock:
+            self._pending.pop(serial, None)
+            dev = self._devices.get(serial)
+            if props and dev:
+                self._properties[serial] = props
+                if dev["state"] == "device":
+                    dev.update(props)
+                    changed = dict(dev)
+        done.set()
+        if changed:
+            self._notify([("changed", changed)])
+
+    def _read_properties(self, serial: str) -> Optional[dict]:
+        """Model, ABI and SDK of the device, None when it did not answer in time"""
+        try:
+            result = adb_client.run(["shell", PROPERTIES_CMD], serial, timeout=PROPERTIES_TIMEOUT)
+        except (subprocess.TimeoutExpired, OSError, adb_client.AdbError) as e:
+            logging.warning(f"Reading properties of {serial} failed: {e}")
+            return None
+        if result.returncode != 0:
+            return None
+        model, abi, sdk = (value.strip() for value in (result.stdout.splitlines() + ["", "", ""])[:3])
+        return {"model": model or "unknown", "abi": abi, "sdk": sdk}
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> DeviceRegistry:
+    """Process-wide registry, tracking starts on first use"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = DeviceRegistry().start()
+    return _registry
@@ -0,0 +1,24 @@
+# json_store.py (small JSON files kept next to the data they describe: indexes, manifests, caches)
+
+import json
+import os
+
+
+def load_json(path, default=None):
+    """Content of the JSON file at path, default ({} unless given) when it is missing or unreadable"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {} if default is None else default
+
+
+def save_json(path, data, indent=None):
+    """Write data to path atomically: a crash leaves the previous file, never a truncated one"""
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=indent)
+    os.replace(tmp_path, path)
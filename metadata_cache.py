@@ -0,0 +1,41 @@
+import os
+import requests
+
+from json_store import load_json, save_json
+
+METADATA_CACHE_PATH = os.path.join("downloads", "metadata_cache.json")
+REQUEST_TIMEOUT = 15  # seconds
+
+
+def conditional_get_json(url, headers=None, cache_path=METADATA_CACHE_PATH, timeout=REQUEST_TIMEOUT,
+                         get=requests.get):
+    """GET a JSON document, revalidating the cached copy with If-None-Match/If-Modified-Since.
+     Returns (data, changed): data is None when the server answered with an error,
+     changed is False when the server replied 304 and the cached copy was used.
+     requests.ConnectionError is left to the caller, it doubles as the connectivity check.
+     get can be swapped for a pooled session getter such as appcenter_client.api_get"""
+    cache = load_json(cache_path)
+    entry = cache.get(url)
+
+    request_headers = dict(headers or {})
+    if entry:
+        if entry.get("etag"):
+            request_headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            request_headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = get(url, headers=request_headers, timeout=timeout)
+
+    if response.status_code == 304 and entry:
+        return entry["data"], False
+    if response.status_code != 200:
+        return None, True
+
+    data = response.json()
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if etag or last_modified:
+        cache[url] = {"etag": etag, "last_modified": last_modified, "data": data}
+        save_json(cache_path, cache)
+    return data, True
+
@@ -0,0 +1,186 @@
+import re
+import sqlite3
+import threading
+from decouple import config
+from appcenter_client import get_client
+
+DEFAULT_STORE_PATH = "release_notes.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS releases (
+    owner_name TEXT NOT NULL,
+    app_name TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    short_version TEXT,
+    version TEXT,
+    size INTEGER,
+    release_notes TEXT,
+    PRIMARY KEY (owner_name, app_name, id)
+)
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS releases_fts USING fts5(
+    owner_name UNINDEXED,
+    app_name UNINDEXED,
+    release_id UNINDEXED,
+    release_notes,
+    prefix='2 3'
+)
+"""
+
+# "exact phrase", prefix* or plain term
+QUERY_TOKEN = re.compile(r'"([^"]+)"|(\S+)')
+
+
+def build_fts_query(text):
+    """Turn user input into an FTS5 MATCH expression: every term must match (AND),
+     "quoted words" are phrases and a trailing * makes a prefix term"""
+    terms = []
+    for phrase, word in QUERY_TOKEN.findall(text):
+        if phrase:
+            terms.append('"' + phrase.replace('"', '') + '"')
+            continue
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', '')
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " AND ".join(terms)
+
+
+def version_key(version):
+    """'1.10.2' -> (1, 10, 2) so versions compare numerically"""
+    return tuple(int(part) for part in re.findall(r"\d+", version or ""))
+
+
+class ReleaseStore:
+    """Local SQLite copy of AppCenter release details.
+     Releases never change once published, so sync only fetches ids that are not stored yet
+     and searches run against the local database"""
+
+    def __init__(self, path=None):
+        if path is None:
+            path = config("RELEASE_STORE_PATH", default=DEFAULT_STORE_PATH)
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(SCHEMA)
+        self.conn.execute(FTS_SCHEMA)
+        self._backfill_index()
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def stored_ids(self, owner_name, app_name):
+        rows = self.conn.execute(
+            "SELECT id FROM releases WHERE owner_name = ? AND app_name = ?", (owner_name, app_name))
+        return {row[0] for row in rows}
+
+    def sync(self, owner_name, app_name, limit=None, max_workers=None):
+        """Fetch details of the newest releases (all, or the newest limit) that are missing locally.
+         Returns the number of releases added"""
+        client = get_client()
+        # Compare the whole listing with what is stored: a detail fetch that failed last time
+        # leaves a gap below newer releases, which is filled on the next sync
+        stored = self.stored_ids(owner_name, app_name)
+        missing_ids = [release["id"] for release in client.iter_releases(owner_name, app_name, limit=limit)
+                       if release["id"] not in stored]
+        if not missing_ids:
+            return 0
+
+        urls = [client.app_url(owner_name, app_name, "releases", release_id) for release_id in missing_ids]
+        rows = []
+        for release_id, detail in zip(missing_ids, client.get_many(urls, max_workers=max_workers)):
+            if detail.status_code != 200:
+                print(f"Failed to retrieve release ID {release_id} from AppCenter. "
+                      f"Status Code: {detail.status_code}")
+                continue
+            data = detail.json()
+            notes = data.get("release_notes")
+            if isinstance(notes, list):
+                notes = "\n".join(notes)
+            rows.append((owner_name, app_name, release_id, data.get("short_version"),
+                         data.get("version"), data.get("size"), notes))
+
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO releases VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.executemany(
+                "INSERT INTO releases_fts VALUES (?, ?, ?, ?)",
+                [(owner, app, release_id, notes) for owner, app, release_id, _, _, _, notes in rows if notes])
+            self.conn.commit()
+        return len(rows)
+
+    def _backfill_index(self):
+        """Index releases stored before the full-text table existed"""
+        indexed = self.conn.execute("SELECT COUNT(*) FROM releases_fts").fetchone()[0]
+        if indexed:
+            return
+        self.conn.execute(
+            "INSERT INTO releases_fts SELECT owner_name, app_name, id, release_notes FROM releases "
+            "WHERE release_notes IS NOT NULL AND release_notes != ''")
+
+    def search(self, owner_name, app_name, partial_notes, limit=None):
+        """Case-insensitive substring search over the newest limit stored releases.
+         Returns {release_id: {release_notes: [...], short_version, version, size}}, newest first"""
+        return self.search_many(owner_name, app_name, [partial_notes], limit=limit)[partial_notes]
+
+    def search_many(self, owner_name, app_name, queries, limit=None):
+        """Evaluate several substring queries in one pass over the stored releases,
+         each note is lower-cased once. Returns {query: <search result>}"""
+        query = ("SELECT id, short_version, version, size, release_notes FROM releases "
+                 "WHERE owner_name = ? AND app_name = ? ORDER BY id DESC")
+        params = [owner_name, app_name]
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        needles = [(text, text.lower()) for text in queries]
+        results = {text: {} for text in queries}
+        for release_id, short_version, version, size, notes in self.conn.execute(query, params):
+            if not notes:
+                continue
+            lowered = notes.lower()
+            for text, needle in needles:
+                if needle in lowered:
+                    results[text][release_id] = {
+                        "release_notes": [notes],
+                        "short_version": short_version,
+                        "version": version,
+                        "size": size,
+                    }
+        return results
+
+    def full_text_search(self, owner_name, app_name, query, limit=None,
+                         min_version=None, max_version=None):
+        """Indexed search: all terms must match, "phrases" and prefix* terms are supported.
+         Results are ordered by relevance (bm25) and capped at limit;
+         min_version/max_version bound short_version. Returns the same structure as search"""
+        match = build_fts_query(query)
+        if not match:
+            return {}
+        rows = self.conn.execute(
+            "SELECT r.id, r.short_version, r.version, r.size, r.release_notes "
+            "FROM releases_fts f JOIN releases r "
+            "ON r.owner_name = f.owner_name AND r.app_name = f.app_name AND r.id = f.release_id "
+            "WHERE releases_fts MATCH ? AND f.owner_name = ? AND f.app_name = ? "
+            "ORDER BY bm25(releases_fts)",
+            (match, owner_name, app_name))
+
+        low = version_key(min_version) if min_version else None
+        high = version_key(max_version) if max_version else None
+        matching_releases = {}
+        for release_id, short_version, version, size, notes in rows:
+            key = version_key(short_version)
+            if (low and key < low) or (high and key > high):
+                continue
+            matching_releases[release_id] = {
+                "release_notes": [notes],
+                "short_version": short_version,
+                "version": version,
+                "size": size,
+            }
+            if limit and len(matching_releases) >= limit:
+                break
+        return matching_releases
@@ -0,0 +1,250 @@
+# screen_capture.py (screen recording streamed from the device to the PC)
+#
+# `screenrecord --output-format=h264 -` writes the encoded video to stdout. Reading it through
+# exec-out puts every frame on the PC while the recording runs: nothing is stored on the device,
+# and the file is ready as soon as the stream is closed. With ffmpeg on PATH the H.264 stream is
+# muxed into .mp4 on the fly, otherwise the raw stream is saved as .h264.
+#
+# RingRecorder keeps such a stream running in the background and holds only the last N seconds
+# in memory, cut at key frames, so a repro can be saved after it happened.
+
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import adb_client
+
+STREAM_CHUNK_SIZE = 64 * 1024
+FFMPEG_PATH = shutil.which("ffmpeg")
+REPRO_SECONDS = int(os.getenv("REPRO_BUFFER_SECONDS", "30"))
+REPRO_MAX_MB = int(os.getenv("REPRO_BUFFER_MAX_MB", "256"))
+RESTART_DELAY = 1  # seconds before restarting a screenrecord that ended without data
+
+# H.264 NAL unit types
+NAL_IDR, NAL_SPS, NAL_PPS = 5, 7, 8
+START_CODE = b"\x00\x00\x01"
+
+
+def screenrecord_command(bit_rate: Optional[int] = None, size: Optional[str] = None,
+                         time_limit: Optional[int] = None) -> str:
+    """screenrecord writing H.264 to stdout. Its messages go to /dev/null: exec: would mix them
+     into the video stream"""
+    options = ["--output-format=h264"]
+    if bit_rate:
+        options.append(f"--bit-rate {bit_rate}")
+    if size:
+        options.append(f"--size {size}")
+    if time_limit:
+        options.append(f"--time-limit {time_limit}")
+    return "screenrecord " + " ".join(options) + " - 2>/dev/null"
+
+
+class VideoSink:
+    """Destination for the H.264 stream: ffmpeg muxing into .mp4, or a plain .h264 file.
+     path is the file actually written"""
+
+    def __init__(self, dest_path: str, mux: bool = True):
+        base, ext = os.path.splitext(dest_path)
+        self._process = None
+        if mux and FFMPEG_PATH and ext.lower() == ".mp4":
+            self.path = dest_path
+            # raw H.264 carries no timestamps, use the arrival time of each frame
+            self._process = subprocess.Popen(
+                [FFMPEG_PATH, "-loglevel", "error", "-y", "-f", "h264", "-use_wallclock_as_timestamps", "1",
+                 "-i", "pipe:0", "-c", "copy", dest_path],
+                stdin=subprocess.PIPE)
+            self._file = self._process.stdin
+        else:
+            self.path = base + ".h264"
+            self._file = open(self.path, "wb")
+
+    def write(self, data: bytes):
+        self._file.write(data)
+
+    def close(self) -> str:
+        self._file.close()
+        if self._process is not None and self._process.wait() != 0:
+            logging.warning(f"ffmpeg exited with {self._process.returncode} while writing {self.path}")
+        return self.path
+
+
+def record_stream(device_id: str, dest_path: str, stop_event: Optional[threading.Event] = None,
+                  bit_rate: Optional[int] = None, size: Optional[str] = None) -> str:
+    """Record the screen straight into dest_path until stop_event is set (or screenrecord hits
+     its time limit). Returns the path written, see VideoSink"""
+    os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+    stream = adb_client.ExecStream(device_id, screenrecord_command(bit_rate, size))
+    try:
+        sink = VideoSink(dest_path)
+    except Exception:
+        stream.close()
+        raise
+    received = [0]
+
+    def copy():
+        try:
+            for chunk in iter(lambda: stream.read1(STREAM_CHUNK_SIZE), b""):
+                sink.write(chunk)
+                received[0] += len(chunk)
+        except (OSError, ValueError):
+            pass  # stream closed by stop
+
+    reader = threading.Thread(target=copy, name=f"screenrecord-{device_id}", daemon=True)
+    reader.start()
+    try:
+        while reader.is_alive():
+            if stop_event is not None:
+                if stop_event.wait(0.1):
+                    break
+            else:
+                reader.join(0.1)
+    finally:
+        stream.close()
+        reader.join()
+        path = sink.close()
+    if not received[0]:
+        if os.path.exists(path):
+            os.remove(path)
+        raise RuntimeError("screenrecord produced no data (device may not support --output-format=h264)")
+    return path
+
+
+def iter_nal_units(chunks):
+    """Split an Annex-B H.264 byte stream into NAL units (each starting with its start code)"""
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        start = buffer.find(START_CODE)
+        if start < 0:
+            continue
+        while True:
+            end = buffer.find(START_CODE, start + 3)
+            if end < 0:
+                break
+            yield bytes(buffer[start:end])
+            start = end
+        del buffer[:start]
+    if buffer.startswith(START_CODE):
+        yield bytes(buffer)
+
+
+class RingRecorder:
+    """Always-on streamed recording that keeps only the last `seconds` of video in memory.
+     The stream is cut into segments at key frames; a segment is dropped once the next one
+     starts before the window, or when the buffer exceeds max_mb. screenrecord is restarted
+     whenever it stops (3 minute limit). Note that screenrecord emits a key frame about every
+     10 seconds, so a saved clip may start up to that much earlier than the window"""
+
+    def __init__(self, device_id: str, seconds: int = REPRO_SECONDS, max_mb: int = REPRO_MAX_MB,
+                 bit_rate: Optional[int] = None, size: Optional[str] = None):
+        self.device_id = device_id
+        self.seconds = seconds
+        self.max_bytes = max_mb * 1024 * 1024
+        self.command = screenrecord_command(bit_rate, size)
+        self._segments = deque()  # [arrival time, bytearray], oldest first
+        self._size = 0
+        self._params = {}  # latest SPS / PPS, repeated at the start of every segment
+        self._last_is_idr = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._stream = None
+        self._stream_lock = threading.Lock()  # hands the running stream over to stop()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"repro-buffer-{self.device_id}",
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._stream_lock:
+            stream = self._stream
+        if stream is not None:
+            stream.close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def buffered_seconds(self) -> float:
+        with self._lock:
+            return time.monotonic() - self._segments[0][0] if self._segments else 0.0
+
+    def save(self, dest_path: str) -> str:
+        """Write the buffered video to dest_path, returns the path written.
+         Saved as raw .h264: the frames come out of the buffer at once, arrival-time stamps
+         as used by record_stream would squeeze the clip"""
+        with self._lock:
+            data = [bytes(segment) for _, segment in self._segments]
+        if not data:
+            raise RuntimeError("Repro buffer is empty")
+        os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+        sink = VideoSink(dest_path, mux=False)
+        try:
+            for segment in data:
+                sink.write(segment)
+        finally:
+            path = sink.close()
+        return path
+
+    def _run(self):
+        while not self._stop.is_set():
+            received = 0
+            self._last_is_idr = False  # a restarted screenrecord opens with a new key frame
+            stream = None
+            try:
+                stream = adb_client.ExecStream(self.device_id, self.command)
+                with self._stream_lock:
+                    # stop() may have run while the stream was opening, it could not close it then
+                    if self._stop.is_set():
+                        break
+                    self._stream = stream
+                chunks = iter(lambda: stream.read1(STREAM_CHUNK_SIZE), b"")
+                for nal in iter_nal_units(chunks):
+                    received += len(nal)
+                    self._add(nal)
+            except (OSError, ValueError, adb_client.AdbError) as e:
+                if not self._stop.is_set():
+                    logging.warning(f"Repro buffer on {self.device_id} interrupted: {e}")
+            finally:
+                with self._stream_lock:
+                    self._stream = None
+                if stream is not None:
+                    stream.close()
+            if not received:
+                self._stop.wait(RESTART_DELAY)
+
+    def _add(self, nal: bytes):
+        if len(nal) <= len(START_CODE):
+            return
+        nal_type = nal[3] & 0x1F
+        if nal_type in (NAL_SPS, NAL_PPS):
+            self._params[nal_type] = nal
+            return
+        now = time.monotonic()
+        with self._lock:
+            last = self._segments[-1][1] if self._segments else None
+            if nal_type == NAL_IDR and (last is None or not self._last_is_idr):
+                segment = bytearray(b"".join(self._params[t] for t in (NAL_SPS, NAL_PPS) if t in self._params))
+                self._segments.append([now, segment])
+                self._size += len(segment)
+                self._trim(now)
+                last = segment
+            self._last_is_idr = nal_type == NAL_IDR
+            if last is None:
+                return  # nothing usable before the first key frame
+            last += nal
+            self._size += len(nal)
+
+    def _trim(self, now: float):
+        cutoff = now - self.seconds
+        while len(self._segments) > 1 and (self._segments[1][0] <= cutoff or self._size > self.max_bytes):
+            _, dropped = self._segments.popleft()
+            self._size -= len(dropped)
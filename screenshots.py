@@ -0,0 +1,196 @@
+# screenshots.py (fast screenshots: raw framebuffer from the device, PNG encoded on the PC)
+#
+# `screencap -p` makes the phone compress the PNG, which takes most of the screenshot time.
+# Plain `screencap` writes the raw framebuffer instead: a small header followed by the pixels.
+# The pixels are read into one preallocated buffer and handed to a worker thread that encodes
+# the PNG with zlib (which releases the GIL), so the next frame can be grabbed right away.
+# Bursts hash every frame and skip those identical to the previous one before encoding.
+
+import hashlib
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, NamedTuple, Optional
+
+import adb_client
+
+PNG_COMPRESSION = int(os.getenv("PNG_COMPRESSION", "1"))  # zlib level, speed over size
+ENCODE_WORKERS = 4
+# exec: mixes stderr into the image bytes, and screencap warns on stderr on every call on
+# devices with several displays
+SCREENCAP_RAW = "screencap 2>/dev/null"
+SCREENCAP_PNG = "screencap -p 2>/dev/null"
+DEFAULT_BURST_RATE = 5  # shots per second
+DEFAULT_BURST_DURATION = 3  # seconds
+READ_CHUNK_SIZE = 256 * 1024
+
+# screencap pixel formats (android PixelFormat) -> bytes per pixel
+RGBA_8888, RGBX_8888, RGB_888, RGB_565, BGRA_8888 = 1, 2, 3, 4, 5
+BYTES_PER_PIXEL = {RGBA_8888: 4, RGBX_8888: 4, RGB_888: 3, BGRA_8888: 4}
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+
+class Frame(NamedTuple):
+    width: int
+    height: int
+    format: int
+    pixels: memoryview  # width * height * bytes per pixel, rows top to bottom
+    taken_at: float  # time.monotonic() when the grab finished
+
+
+def grab_frame(device_id: Optional[str]) -> Frame:
+    """Read one raw framebuffer. Raises ValueError for pixel formats that can't be encoded here"""
+    with adb_client.ExecStream(device_id, SCREENCAP_RAW) as stream:
+        header = _read_into(stream, bytearray(16))
+        if len(header) < 12:
+            raise ValueError("screencap returned no image")
+        width, height, pixel_format = struct.unpack_from("<III", header)
+        bpp = BYTES_PER_PIXEL.get(pixel_format)
+        if bpp is None:
+            raise ValueError(f"Unsupported framebuffer format {pixel_format}")
+        size = width * height * bpp
+
+        # Newer devices add a 4 byte color space to the 12 byte header, which one it is shows
+        # only by the total length: read everything into one buffer and take the tail
+        buffer = bytearray(16 + size)
+        buffer[:len(header)] = header
+        total = len(header) + len(_read_into(stream, memoryview(buffer)[len(header):]))
+    if total < 12 + size:
+        raise ValueError(f"Framebuffer truncated: {total} bytes for {width}x{height}")
+    offset = total - size
+    return Frame(width, height, pixel_format, memoryview(buffer)[offset:offset + size], time.monotonic())
+
+
+def encode_png(frame: Frame, path: str, level: int = PNG_COMPRESSION) -> str:
+    """Write frame as PNG (8 bit RGBA, or RGB for RGB_888). Returns path"""
+    pixels = frame.pixels
+    color_type = 6  # RGBA
+    if frame.format == RGB_888:
+        color_type = 2
+    elif frame.format == BGRA_8888:
+        swapped = bytearray(pixels)
+        swapped[0::4], swapped[2::4] = pixels[2::4], pixels[0::4]
+        pixels = memoryview(swapped)
+    elif frame.format == RGBX_8888:
+        opaque = bytearray(pixels)
+        opaque[3::4] = b"\xff" * (frame.width * frame.height)
+        pixels = memoryview(opaque)
+
+    stride = len(pixels) // frame.height
+    # every row is prefixed with filter type 0 (none)
+    raw = b"".join(b"\x00" + pixels[row:row + stride] for row in range(0, len(pixels), stride))
+    ihdr = struct.pack(">IIBBBBB", frame.width, frame.height, 8, color_type, 0, 0, 0)
+
+    tmp_path = path + ".part"
+    with open(tmp_path, "wb") as f:
+        f.write(PNG_SIGNATURE)
+        for chunk_type, data in ((b"IHDR", ihdr), (b"IDAT", zlib.compress(raw, level)), (b"IEND", b"")):
+            f.write(struct.pack(">I", len(data)) + chunk_type + data)
+            f.write(struct.pack(">I", zlib.crc32(chunk_type + data)))
+    os.replace(tmp_path, path)
+    return path
+
+
+def get_encoder() -> ThreadPoolExecutor:
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                _encoder = ThreadPoolExecutor(max_workers=ENCODE_WORKERS, thread_name_prefix="png-encode")
+    return _encoder
+
+
+def take_screenshot(device_id: Optional[str], path: str) -> Future:
+    """Grab the framebuffer now and encode it in the background, the future returns path.
+     Devices with a framebuffer format not handled here fall back to `screencap -p`"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    try:
+        return _save(_grab(device_id), path)
+    except Exception as error:
+        future = Future()
+        future.set_exception(error)
+        return future
+
+
+def frame_digest(shot) -> bytes:
+    """Hash of the pixels (or of the device PNG), equal digests mean identical screens"""
+    return hashlib.blake2b(shot.pixels if isinstance(shot, Frame) else shot, digest_size=16).digest()
+
+
+def burst(device_id: Optional[str], dest_folder: str, base_name: str, rate: float = DEFAULT_BURST_RATE,
+          duration: float = None, count: int = None, dedupe: bool = True,
+          stop_event: Optional[threading.Event] = None) -> List[str]:
+    """Take rate shots per second for duration seconds (or count shots) into
+     <base_name>_0001.png, <base_name>_0002.png, ... Grabs are paced by the clock, when a grab
+     takes longer than the interval the next one starts right away.
+     dedupe drops a shot whose pixels are identical to the previous one before it is encoded,
+     stop_event ends the burst early. Returns the paths written"""
+    if count is None:
+        count = max(1, int(rate * duration)) if duration else 1
+    os.makedirs(dest_folder, exist_ok=True)
+    interval = 1.0 / rate
+    started = time.monotonic()
+    futures = []
+    previous = None
+    dropped = 0
+    for index in range(count):
+        delay = started + index * interval - time.monotonic()
+        if stop_event is not None and stop_event.wait(max(delay, 0)):
+            break
+        if stop_event is None and delay > 0:
+            time.sleep(delay)
+        shot = _grab(device_id)
+        if dedupe:
+            digest = frame_digest(shot)
+            if digest == previous:
+                dropped += 1
+                continue
+            previous = digest
+        path = os.path.join(dest_folder, f"{base_name}_{len(futures) + 1:04d}.png")
+        futures.append(_save(shot, path))
+    if dropped:
+        logging.info(f"Burst: {dropped} unchanged frame(s) dropped, {len(futures)} kept")
+    return [future.result() for future in futures]
+
+
+def _grab(device_id):
+    """Frame, or PNG bytes from `screencap -p` when the raw format can't be encoded here"""
+    try:
+        return grab_frame(device_id)
+    except ValueError as e:
+        logging.debug(f"Raw screenshot not possible ({e}), using screencap -p")
+    result = adb_client.run(["exec-out", SCREENCAP_PNG], device_id, text=False)
+    if result.returncode != 0 or not result.stdout:
+        message = result.stderr.decode("utf-8", "replace").strip() or "no image returned"
+        raise RuntimeError(f"screencap failed: {message}")
+    return result.stdout
+
+
+def _save(shot, path) -> Future:
+    if isinstance(shot, Frame):
+        return get_encoder().submit(encode_png, shot, path)
+    with open(path, "wb") as f:
+        f.write(shot)
+    future = Future()
+    future.set_result(path)
+    return future
+
+
+def _read_into(stream, buffer):
+    """Fill buffer from stream until it is full or the stream ends, returns the filled part"""
+    view = memoryview(buffer)
+    filled = 0
+    while filled < len(view):
+        read = stream.readinto(view[filled:filled + READ_CHUNK_SIZE])
+        if not read:
+            break
+        filled += read
+    return view[:filled]
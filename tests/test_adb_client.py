@@ -0,0 +1,185 @@
+"""adb_client wire protocol against an in-process fake adb server.
+Run from the repository root: python -m pytest tests (or python -m unittest discover tests)"""
+
+import os
+import socketserver
+import stat
+import struct
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import adb_client
+
+SERIAL = "emulator-5554"
+FILES = {
+    "/sdcard/a.txt": b"alpha",
+    "/sdcard/big.bin": bytes(range(256)) * 600,  # more than one DATA packet
+    "/sdcard/denied.txt": b"unreadable",  # STAT works, RECV answers FAIL
+    "/sdcard/z.txt": b"zulu",
+}
+DIRS = {"/sdcard", "/sdcard/DCIM"}
+SHELL = {"echo": ([b"o", b"ut"], [b"err"], 3)}  # command -> (stdout packets, stderr packets, exit code)
+MTIME = 1700000000
+
+
+class FakeAdbHandler(socketserver.BaseRequestHandler):
+    """Host side of the adb server for one connection, with the device services behind it"""
+
+    def handle(self):
+        self.server.connections += 1
+        try:
+            request = self.read_request()
+            if request == "host:devices":
+                return self.okay(self.prefixed(f"{SERIAL}\tdevice\n".encode()))
+            if request != f"host:transport:{SERIAL}":
+                return self.fail(f"device '{request.rsplit(':', 1)[-1]}' not found")
+            self.okay()
+            service = self.read_request()
+            if service.startswith("shell,v2,raw:"):
+                self.shell_v2(service.split(":", 1)[1])
+            elif service.startswith("exec:"):
+                self.okay(b"exec " + service.split(":", 1)[1].encode())
+            elif service == "sync:":
+                self.okay()
+                self.sync()
+            else:
+                self.fail(f"unknown service {service}")
+        except ConnectionError:
+            pass
+
+    def read_exact(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("client went away")
+            data += chunk
+        return data
+
+    def read_request(self):
+        return self.read_exact(int(self.read_exact(4), 16)).decode()
+
+    @staticmethod
+    def prefixed(data):
+        return b"%04x" % len(data) + data
+
+    def okay(self, data=b""):
+        self.request.sendall(b"OKAY" + data)
+
+    def fail(self, message):
+        self.request.sendall(b"FAIL" + self.prefixed(message.encode()))
+
+    def shell_v2(self, command):
+        stdout, stderr, code = SHELL[command]
+        packets = [(adb_client.SHELL_STDOUT, data) for data in stdout]
+        packets += [(adb_client.SHELL_STDERR, data) for data in stderr]
+        packets.append((adb_client.SHELL_EXIT, bytes([code])))
+        self.okay(b"".join(struct.pack("<BI", packet_id, len(data)) + data for packet_id, data in packets))
+
+    def sync(self):
+        while True:
+            command = self.read_exact(4)
+            (length,) = struct.unpack("<I", self.read_exact(4))
+            path = self.read_exact(length).decode()
+            if command == b"QUIT":
+                return
+            if command == b"STAT":
+                if path in FILES:
+                    mode = stat.S_IFREG | 0o644
+                    size = len(FILES[path])
+                elif path in DIRS:
+                    mode, size = stat.S_IFDIR | 0o755, 0
+                else:
+                    mode = size = 0
+                self.request.sendall(b"STAT" + struct.pack("<III", mode, size, MTIME if mode else 0))
+            elif command == b"RECV":
+                if path not in FILES or path.endswith("denied.txt"):
+                    message = b"Permission denied" if path in FILES else b"No such file or directory"
+                    self.request.sendall(b"FAIL" + struct.pack("<I", len(message)) + message)
+                    return  # adbd ends the sync service after a FAIL
+                data = FILES[path]
+                for start in range(0, len(data), adb_client.SYNC_DATA_MAX):
+                    chunk = data[start:start + adb_client.SYNC_DATA_MAX]
+                    self.request.sendall(b"DATA" + struct.pack("<I", len(chunk)) + chunk)
+                self.request.sendall(b"DONE" + struct.pack("<I", MTIME))
+            else:
+                return
+
+
+class AdbClientTest(unittest.TestCase):
+    def setUp(self):
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), FakeAdbHandler)
+        self.server.daemon_threads = True
+        self.server.connections = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = adb_client.AdbClient(port=self.server.server_address[1])
+        patcher = mock.patch.object(adb_client, "_client", self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def local(self, name):
+        return os.path.join(self.folder.name, name)
+
+    def test_devices(self):
+        self.assertEqual(self.client.devices(), f"{SERIAL}\tdevice\n")
+
+    def test_unknown_device_raises(self):
+        with self.assertRaisesRegex(adb_client.AdbError, "not found"):
+            self.client.exec_out("nope", "true")
+
+    def test_shell_v2_separates_streams_and_exit_code(self):
+        self.assertEqual(self.client.shell(SERIAL, "echo"), (3, b"out", b"err"))
+
+    def test_execute_native_shell(self):
+        result = adb_client.execute_native(["shell", "echo"], SERIAL, timeout=5)
+        self.assertEqual((result.returncode, result.stdout, result.stderr), (3, "out", "err"))
+
+    def test_exec_out(self):
+        self.assertEqual(self.client.exec_out(SERIAL, "screencap"), b"exec screencap")
+
+    def test_sync_stat(self):
+        with self.client.sync(SERIAL, timeout=5) as session:
+            mode, size, mtime = session.stat("/sdcard/a.txt")
+            self.assertTrue(stat.S_ISREG(mode))
+            self.assertEqual((size, mtime), (5, MTIME))
+            self.assertTrue(stat.S_ISDIR(session.stat("/sdcard/DCIM")[0]))
+            self.assertEqual(session.stat("/sdcard/missing"), (0, 0, 0))
+
+    def test_sync_pull_reassembles_data_packets(self):
+        path = self.local("big.bin")
+        with self.client.sync(SERIAL, timeout=5) as session:
+            self.assertEqual(session.pull("/sdcard/big.bin", path), len(FILES["/sdcard/big.bin"]))
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), FILES["/sdcard/big.bin"])
+        self.assertFalse(os.path.exists(path + ".part"))
+
+    def test_sync_session_is_reused(self):
+        for name in ("a.txt", "z.txt"):
+            with self.client.sync(SERIAL, timeout=5) as session:
+                session.pull(f"/sdcard/{name}", self.local(name))
+        self.assertEqual(self.server.connections, 1)
+
+    def test_pull_files_reports_failures_and_continues(self):
+        names = ["a.txt", "missing.txt", "DCIM", "denied.txt", "z.txt"]
+        results = list(adb_client.pull_files(SERIAL, [(f"/sdcard/{name}", self.local(name)) for name in names],
+                                              timeout=5))
+        errors = {os.path.basename(remote): error for remote, _, _, error in results}
+        self.assertEqual(len(results), len(names))
+        self.assertIsNone(errors["a.txt"])
+        self.assertIn("does not exist", errors["missing.txt"])
+        self.assertIn("not a regular file", errors["DCIM"])
+        self.assertIn("Permission denied", errors["denied.txt"])
+        self.assertIsNone(errors["z.txt"])  # pulled over a new session after the FAIL
+        with open(self.local("z.txt"), "rb") as f:
+            self.assertEqual(f.read(), b"zulu")
+        self.assertFalse(os.path.exists(self.local("denied.txt")))
+
+
+if __name__ == "__main__":
+    unittest.main()
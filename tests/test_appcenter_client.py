@@ -0,0 +1,56 @@
+"""Streaming JSON array parser used for the AppCenter release listing.
+Run from the repository root: python -m pytest tests (or python -m unittest discover tests)"""
+
+import json
+import unittest
+
+import appcenter_client
+
+RELEASES = [
+    {"id": 3, "short_version": "2.1.0", "version": "310", "notes": "Fixed [login], crash {again}"},
+    {"id": 2, "short_version": "2.0.9", "version": "309", "notes": "Übersetzung \"de\" – emoji 🚀"},
+    {"id": 1, "short_version": "2.0.8", "version": "308", "notes": None, "tags": [1, [2, 3], {"a": []}]},
+]
+
+
+class FakeResponse:
+    """iter_content of a streamed requests response, cut into fixed-size byte chunks"""
+
+    def __init__(self, body: bytes, encoding="utf-8"):
+        self.body = body
+        self.encoding = encoding
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+
+class IterJsonArrayTest(unittest.TestCase):
+    body = json.dumps(RELEASES, ensure_ascii=False, indent=1).encode("utf-8")
+
+    def parse(self, body, chunk_size):
+        return list(appcenter_client.iter_json_array(FakeResponse(body), chunk_size=chunk_size))
+
+    def test_items_split_across_chunks(self):
+        for chunk_size in (1, 2, 3, 7, 64, len(self.body)):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.parse(self.body, chunk_size), RELEASES)
+
+    def test_compact_and_empty_arrays(self):
+        self.assertEqual(self.parse(json.dumps(RELEASES).encode(), 5), RELEASES)
+        self.assertEqual(self.parse(b" [ ] ", 1), [])
+
+    def test_items_are_yielded_before_the_array_ends(self):
+        items = appcenter_client.iter_json_array(FakeResponse(b'[{"id": 1}, {"id": 2}, {"id"'), chunk_size=4)
+        self.assertEqual(next(items), {"id": 1})
+        self.assertEqual(next(items), {"id": 2})
+        with self.assertRaises(ValueError):
+            next(items)  # truncated last item
+
+    def test_not_an_array(self):
+        with self.assertRaises(ValueError):
+            self.parse(b'{"id": 1}', 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+"""FTS5 query building and the indexed release notes search of ReleaseStore.
+Run from the repository root: python -m pytest tests (or python -m unittest discover tests)"""
+
+import unittest
+
+import release_store
+
+OWNER, APP = "owner", "app"
+RELEASES = [
+    (OWNER, APP, 1, "1.0.0", "100", 1000, "Initial release"),
+    (OWNER, APP, 2, "1.1.0", "110", 1100, "Fixed crash on the login screen"),
+    (OWNER, APP, 3, "1.2.0", "120", 1200, "Payment screen redesign, login is faster"),
+    (OWNER, APP, 4, "1.10.0", "200", 2000, "Payments: screen for login errors"),
+    ("other", APP, 5, "9.0.0", "900", 9000, "login screen"),
+]
+
+
+class BuildFtsQueryTest(unittest.TestCase):
+    def test_words_are_quoted_and_joined_with_and(self):
+        self.assertEqual(release_store.build_fts_query("login crash"), '"login" AND "crash"')
+
+    def test_phrases_and_prefix_terms(self):
+        self.assertEqual(release_store.build_fts_query('"login screen" pay*'),
+                         '"login screen" AND "pay"*')
+
+    def test_fts_syntax_in_input_is_neutralised(self):
+        self.assertEqual(release_store.build_fts_query('NOT a"b OR (c)'), '"NOT" AND "ab" AND "OR" AND "(c)"')
+        self.assertEqual(release_store.build_fts_query("* ** \"\""), "")
+
+
+class FullTextSearchTest(unittest.TestCase):
+    def setUp(self):
+        self.store = release_store.ReleaseStore(":memory:")
+        self.addCleanup(self.store.close)
+        self.store.conn.executemany("INSERT INTO releases VALUES (?, ?, ?, ?, ?, ?, ?)", RELEASES)
+        self.store.conn.executemany("INSERT INTO releases_fts VALUES (?, ?, ?, ?)",
+                                    [(owner, app, release_id, notes) for owner, app, release_id, *_, notes in RELEASES])
+
+    def search(self, query, **kwargs):
+        return self.store.full_text_search(OWNER, APP, query, **kwargs)
+
+    def test_phrase_matches_adjacent_words_only(self):
+        self.assertEqual(set(self.search('"login screen"')), {2})
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(set(self.search("login screen")), {2, 3, 4})
+
+    def test_prefix_term(self):
+        self.assertEqual(set(self.search("pay*")), {3, 4})
+        self.assertEqual(set(self.search("pay")), set())
+
+    def test_version_bounds_compare_numerically(self):
+        self.assertEqual(set(self.search("login", min_version="1.2.0")), {3, 4})
+        self.assertEqual(set(self.search("login", max_version="1.9")), {2, 3})
+
+    def test_result_structure(self):
+        self.assertEqual(self.search('"crash"'), {2: {"release_notes": ["Fixed crash on the login screen"],
+                                                      "short_version": "1.1.0", "version": "110", "size": 1100}})
+
+
+if __name__ == "__main__":
+    unittest.main()
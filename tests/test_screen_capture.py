@@ -0,0 +1,88 @@
+"""H.264 Annex-B splitting and the repro buffer's segments, fed with hand-built NAL units.
+Run from the repository root: python -m pytest tests (or python -m unittest discover tests)"""
+
+import os
+import tempfile
+import unittest
+
+import screen_capture
+
+SPS = b"\x00\x00\x00\x01\x67sps-payload"
+PPS = b"\x00\x00\x00\x01\x68pps"
+IDR = b"\x00\x00\x00\x01\x65key-frame"
+P_FRAME = b"\x00\x00\x01\x41delta"  # 3 byte start code
+
+
+def nal_type(nal):
+    return nal[3] & 0x1F
+
+
+def short(nal):
+    """nal with a 3 byte start code, as iter_nal_units hands it on (the extra zero of a 4 byte
+     start code stays at the end of the unit before)"""
+    return nal[1:] if nal.startswith(b"\x00\x00\x00\x01") else nal
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class IterNalUnitsTest(unittest.TestCase):
+    stream = SPS + PPS + IDR + P_FRAME + P_FRAME + IDR
+
+    def test_whole_stream(self):
+        units = list(screen_capture.iter_nal_units([self.stream]))
+        self.assertEqual([nal_type(unit) for unit in units], [7, 8, 5, 1, 1, 5])
+        self.assertTrue(all(unit.startswith(screen_capture.START_CODE) for unit in units))
+        self.assertEqual(b"".join(units), self.stream[1:])
+
+    def test_start_codes_split_across_chunks(self):
+        expected = list(screen_capture.iter_nal_units([self.stream]))
+        for size in (1, 2, 3, 5, 7):
+            with self.subTest(chunk_size=size):
+                self.assertEqual(list(screen_capture.iter_nal_units(chunked(self.stream, size))), expected)
+
+    def test_data_before_first_start_code_is_dropped(self):
+        units = list(screen_capture.iter_nal_units([b"garbage", IDR]))
+        self.assertEqual([nal_type(unit) for unit in units], [5])
+
+
+class RingRecorderSegmentsTest(unittest.TestCase):
+    def feed(self, recorder, *nals):
+        for nal in nals:
+            recorder._add(short(nal))
+
+    def test_parameter_sets_start_every_segment(self):
+        recorder = screen_capture.RingRecorder("emulator-5554", seconds=60)
+        self.feed(recorder, P_FRAME, SPS, PPS, IDR, P_FRAME, IDR, P_FRAME)
+        segments = [bytes(segment) for _, segment in recorder._segments]
+        self.assertEqual(len(segments), 2)
+        for segment in segments:
+            self.assertTrue(segment.startswith(short(SPS) + short(PPS) + short(IDR)))
+        self.assertTrue(segments[1].endswith(P_FRAME))
+        self.assertEqual(recorder._size, sum(len(segment) for segment in segments))
+
+    def test_nothing_buffered_before_a_key_frame(self):
+        recorder = screen_capture.RingRecorder("emulator-5554")
+        self.feed(recorder, SPS, PPS, P_FRAME, P_FRAME)
+        self.assertEqual(recorder.buffered_seconds(), 0.0)
+        with self.assertRaises(RuntimeError):
+            recorder.save(os.path.join(tempfile.gettempdir(), "unused.h264"))
+
+    def test_old_segments_are_dropped(self):
+        recorder = screen_capture.RingRecorder("emulator-5554", seconds=0)
+        self.feed(recorder, SPS, PPS, IDR, P_FRAME, IDR, P_FRAME, IDR)
+        self.assertEqual(len(recorder._segments), 1)
+
+    def test_save_writes_segments_in_order(self):
+        recorder = screen_capture.RingRecorder("emulator-5554", seconds=60)
+        self.feed(recorder, SPS, PPS, IDR, P_FRAME, IDR)
+        with tempfile.TemporaryDirectory() as folder:
+            path = recorder.save(os.path.join(folder, "repro.mp4"))
+            self.assertTrue(path.endswith(".h264"))
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), b"".join(bytes(segment) for _, segment in recorder._segments))
+
+
+if __name__ == "__main__":
+    unittest.main()
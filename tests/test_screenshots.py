@@ -0,0 +1,126 @@
+"""Raw framebuffer parsing and PNG encoding, the PNG is checked by decoding it with zlib.
+Run from the repository root: python -m pytest tests (or python -m unittest discover tests)"""
+
+import io
+import os
+import struct
+import tempfile
+import time
+import unittest
+import zlib
+from unittest import mock
+
+import screenshots
+
+WIDTH, HEIGHT = 5, 3
+
+
+def read_png(path):
+    """-> (width, height, color type, raw rows without filter bytes); checks signature and CRCs"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(screenshots.PNG_SIGNATURE):
+        raise AssertionError("missing PNG signature")
+    pos = len(screenshots.PNG_SIGNATURE)
+    chunks = {}
+    while pos < len(data):
+        (length,) = struct.unpack_from(">I", data, pos)
+        chunk_type = data[pos + 4:pos + 8]
+        body = data[pos + 8:pos + 8 + length]
+        (crc,) = struct.unpack_from(">I", data, pos + 8 + length)
+        if crc != zlib.crc32(chunk_type + body):
+            raise AssertionError(f"bad CRC in {chunk_type!r}")
+        chunks[chunk_type] = chunks.get(chunk_type, b"") + body
+        pos += 12 + length
+    width, height, depth, color_type = struct.unpack_from(">IIBB", chunks[b"IHDR"])
+    assert depth == 8 and b"IEND" in chunks
+    raw = zlib.decompress(chunks[b"IDAT"])
+    stride = len(raw) // height
+    rows = []
+    for row in range(height):
+        line = raw[row * stride:(row + 1) * stride]
+        assert line[0] == 0, "filter type none expected"
+        rows.append(line[1:])
+    return width, height, color_type, b"".join(rows)
+
+
+def pixels(bpp):
+    return bytes((index * 37 + 11) % 256 for index in range(WIDTH * HEIGHT * bpp))
+
+
+class EncodePngTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def encode(self, pixel_format, data):
+        frame = screenshots.Frame(WIDTH, HEIGHT, pixel_format, memoryview(data), time.monotonic())
+        path = screenshots.encode_png(frame, os.path.join(self.folder.name, "shot.png"))
+        self.assertFalse(os.path.exists(path + ".part"))
+        return read_png(path)
+
+    def test_rgba_is_stored_as_is(self):
+        data = pixels(4)
+        self.assertEqual(self.encode(screenshots.RGBA_8888, data), (WIDTH, HEIGHT, 6, data))
+
+    def test_bgra_channels_are_swapped(self):
+        data = pixels(4)
+        expected = bytearray(data)
+        expected[0::4], expected[2::4] = data[2::4], data[0::4]
+        self.assertEqual(self.encode(screenshots.BGRA_8888, data), (WIDTH, HEIGHT, 6, bytes(expected)))
+
+    def test_rgbx_becomes_opaque(self):
+        data = pixels(4)
+        expected = bytearray(data)
+        expected[3::4] = b"\xff" * (WIDTH * HEIGHT)
+        self.assertEqual(self.encode(screenshots.RGBX_8888, data), (WIDTH, HEIGHT, 6, bytes(expected)))
+
+    def test_rgb_888_is_stored_as_rgb(self):
+        data = pixels(3)
+        self.assertEqual(self.encode(screenshots.RGB_888, data), (WIDTH, HEIGHT, 2, data))
+
+    def test_frame_digest_detects_changes(self):
+        data = bytearray(pixels(4))
+        frame = screenshots.Frame(WIDTH, HEIGHT, screenshots.RGBA_8888, memoryview(data), 0.0)
+        same = screenshots.Frame(WIDTH, HEIGHT, screenshots.RGBA_8888, memoryview(bytes(data)), 1.0)
+        self.assertEqual(screenshots.frame_digest(frame), screenshots.frame_digest(same))
+        changed = bytearray(data)
+        changed[-1] ^= 1
+        self.assertNotEqual(screenshots.frame_digest(frame), screenshots.frame_digest(memoryview(changed)))
+
+
+class FakeScreencap(io.BytesIO):
+    """Stands in for adb_client.ExecStream(device_id, command) with fixed output"""
+    output = b""
+
+    def __init__(self, device_id, command):
+        super().__init__(self.output)
+
+
+class GrabFrameTest(unittest.TestCase):
+    def grab(self, output):
+        FakeScreencap.output = output
+        with mock.patch.object(screenshots.adb_client, "ExecStream", FakeScreencap):
+            return screenshots.grab_frame("emulator-5554")
+
+    def test_12_and_16_byte_headers(self):
+        data = pixels(4)
+        header = struct.pack("<III", WIDTH, HEIGHT, screenshots.RGBA_8888)
+        for extra in (b"", struct.pack("<I", 1)):  # newer devices append a color space
+            with self.subTest(header_size=len(header + extra)):
+                frame = self.grab(header + extra + data)
+                self.assertEqual((frame.width, frame.height, frame.format), (WIDTH, HEIGHT, screenshots.RGBA_8888))
+                self.assertEqual(bytes(frame.pixels), data)
+
+    def test_truncated_and_unsupported_frames(self):
+        header = struct.pack("<III", WIDTH, HEIGHT, screenshots.RGBA_8888)
+        with self.assertRaisesRegex(ValueError, "truncated"):
+            self.grab(header + pixels(4)[:-1])
+        with self.assertRaisesRegex(ValueError, "Unsupported"):
+            self.grab(struct.pack("<III", WIDTH, HEIGHT, screenshots.RGB_565) + pixels(2))
+        with self.assertRaisesRegex(ValueError, "no image"):
+            self.grab(b"")
+
+
+if __name__ == "__main__":
+    unittest.main()